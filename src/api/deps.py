@@ -1,8 +1,43 @@
 from functools import lru_cache
+import secrets
+
+from fastapi import Header, HTTPException
 
 from src.rag.pipeline import RagPipeline
+from src.api.tenants import Tenant, TenantManager, UnknownTenant
+from src.config import ADMIN_TOKEN
 
 
 @lru_cache()
 def get_rag_pipeline() -> RagPipeline:
     return RagPipeline()
+
+
+@lru_cache()
+def get_tenant_manager() -> TenantManager:
+    return TenantManager()
+
+
+def _get_tenant(tenant_id: str | None, create: bool) -> Tenant:
+    try:
+        return get_tenant_manager().get(tenant_id, create=create)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UnknownTenant as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+def get_tenant(x_tenant_id: str | None = Header(default=None)) -> Tenant:
+    return _get_tenant(x_tenant_id, create=False)
+
+
+def get_or_create_tenant(x_tenant_id: str | None = Header(default=None)) -> Tenant:
+    # Only uploads may create a tenant
+    return _get_tenant(x_tenant_id, create=True)
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
@@ -1,31 +1,108 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
 from pathlib import Path
 import shutil
+import threading
+import time
 import uuid
 
-from src.rag.pipeline import RagPipeline
-from src.config import UPLOADS_DIR, DEFAULT_TOP_K
+from src.api.deps import get_tenant_manager, get_tenant, get_or_create_tenant, require_admin
+from src.api.tenants import Tenant, RateLimitExceeded
+from src.config import UPLOADS_DIR, DEFAULT_TOP_K, INGEST_JOB_TTL_SECONDS, INGEST_JOBS_MAX
 
 app = FastAPI(title="Legal RAG API")
 
-# Initialize pipeline once
-rag = RagPipeline()
+# Tenants (collection, uploads, limits) are opened lazily per X-Tenant-ID header
+tenants = get_tenant_manager()
 
 # Ensure uploads directory exists
 UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
 
+# Background ingest progress, keyed by (tenant, file_id) (in-process only).
+# Finished jobs are dropped after INGEST_JOB_TTL_SECONDS, or oldest first beyond INGEST_JOBS_MAX.
+_ingest_jobs: dict = {}
+_ingest_jobs_lock = threading.Lock()
+_ACTIVE_JOB_STATUSES = ("queued", "running")
+
+
+def _prune_ingest_jobs(now: float):
+    finished = sorted(
+        (job["updated_at"], key) for key, job in _ingest_jobs.items()
+        if job.get("status") not in _ACTIVE_JOB_STATUSES
+    )
+    excess = len(finished) - INGEST_JOBS_MAX
+    for i, (updated_at, key) in enumerate(finished):
+        if i < excess or now - updated_at > INGEST_JOB_TTL_SECONDS:
+            del _ingest_jobs[key]
+
+
+def _set_ingest_job(tenant_id: str, file_id: str, **fields):
+    now = time.time()
+    with _ingest_jobs_lock:
+        job = _ingest_jobs.setdefault((tenant_id, file_id), {"file_id": file_id})
+        job.update(fields, updated_at=now)
+        _prune_ingest_jobs(now)
+
+
+def _yield_to_queries(*_):
+    # Let interactive queries go first between ingest stages and overview sections
+    tenants.gate.yield_to_queries()
+
+
+def _report_stage(tenant_id: str, file_id: str, stage: str):
+    _set_ingest_job(tenant_id, file_id, stage=stage)
+    _yield_to_queries()
+
+
+def _build_overview_job(tenant: Tenant, file_id: str):
+    # Runs in the tenant's ingest slot, which the caller acquired
+    try:
+        tenant.rag.build_overview(file_id, progress=_yield_to_queries)
+    finally:
+        tenants.end_ingest(tenant)
+
+
+def _run_ingest_job(tenant: Tenant, file_id: str, summarize: bool):
+    tid = tenant.tenant_id
+    try:
+        _set_ingest_job(tid, file_id, status="running", stage="parsing")
+        try:
+            result = tenant.rag.ingest_file_id(file_id, progress=lambda stage: _report_stage(tid, file_id, stage))
+        except Exception as e:
+            _set_ingest_job(tid, file_id, status="failed", stage=None, error=str(e))
+            return
+        _set_ingest_job(tid, file_id, status=result.get("status"), stage=None, result=result)
+
+        if summarize and result.get("status") == "ingested":
+            tenant.rag.mark_overview_building(file_id)
+            tenant.rag.build_overview(file_id, progress=_yield_to_queries)
+    finally:
+        tenants.end_ingest(tenant)
+
+
+def _check_file_id(file_id: str) -> str:
+    # file_ids are generated by /upload; anything else could name a path outside the tenant's directories
+    try:
+        return str(uuid.UUID(file_id))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid file_id: {file_id!r}")
+
+
+def _rate_limited(e: RateLimitExceeded) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e))
+
+
 @app.get("/")
 def root():
     return {"message": "Legal RAG API is running. Visit /docs"}
 
 
 @app.post("/upload")
-async def upload_pdf(file: UploadFile = File(...)):
+async def upload_pdf(file: UploadFile = File(...), tenant: Tenant = Depends(get_or_create_tenant)):
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
 
     file_id = str(uuid.uuid4())
-    file_path = UPLOADS_DIR / f"{file_id}.pdf"
+    file_path = tenant.rag.uploads_dir / f"{file_id}.pdf"
 
     with file_path.open("wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
@@ -37,11 +114,62 @@ async def upload_pdf(file: UploadFile = File(...)):
 
 
 @app.post("/ingest/{file_id}")
-def ingest(file_id: str):
+def ingest(file_id: str, summarize: bool = False, background: bool = False, tenant: Tenant = Depends(get_tenant)):
     """
     Ingest a previously uploaded PDF.
+    If summarize is set, a summary and obligation map are built in the background
+    and served from /overview/{file_id}.
+    If background is set, returns immediately; poll /ingest/{file_id}/status for progress.
     """
-    result = rag.ingest_file_id(file_id)
+    file_id = _check_file_id(file_id)
+    if not (tenant.rag.uploads_dir / f"{file_id}.pdf").exists():
+        raise HTTPException(status_code=404, detail=f"PDF not found for file_id={file_id}")
+
+    try:
+        tenants.begin_ingest(tenant)
+    except RateLimitExceeded as e:
+        raise _rate_limited(e)
+
+    if background:
+        _set_ingest_job(tenant.tenant_id, file_id, status="queued", stage=None, error=None, result=None)
+        tenants.ingest_executor.submit(_run_ingest_job, tenant, file_id, summarize)
+        return {"file_id": file_id, "status": "queued"}
+
+    release = True
+    try:
+        result = tenant.rag.ingest_file_id(file_id, progress=_yield_to_queries)
+        if summarize and result.get("status") == "ingested":
+            tenant.rag.mark_overview_building(file_id)
+            tenants.ingest_executor.submit(_build_overview_job, tenant, file_id)
+            release = False  # the overview job releases the ingest slot
+    finally:
+        if release:
+            tenants.end_ingest(tenant)
+    return result
+
+
+@app.get("/ingest/{file_id}/status")
+def ingest_status(file_id: str, tenant: Tenant = Depends(get_tenant)):
+    """
+    Progress of a background ingest started with background=true.
+    """
+    file_id = _check_file_id(file_id)
+    with _ingest_jobs_lock:
+        job = _ingest_jobs.get((tenant.tenant_id, file_id))
+        if job is None:
+            raise HTTPException(status_code=404, detail="No background ingest for this file_id")
+        return dict(job)
+
+
+@app.get("/overview/{file_id}")
+def overview(file_id: str, tenant: Tenant = Depends(get_tenant)):
+    """
+    Precomputed summary and obligation map for an ingested document.
+    """
+    file_id = _check_file_id(file_id)
+    result = tenant.rag.get_overview(file_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No overview for this file_id; ingest with summarize=true")
     return result
 
 
@@ -49,23 +177,44 @@ def ingest(file_id: str):
 def query(
     question: str,
     file_id: str | None = None,
-    top_k: int = DEFAULT_TOP_K
+    top_k: int = DEFAULT_TOP_K,
+    adaptive: bool = False,
+    min_k: int | None = None,
+    tenant: Tenant = Depends(get_tenant)
 ):
     """
     Ask a question against ingested documents.
     If file_id is provided, search is restricted to that document.
+    If adaptive is set, top_k is the maximum and weak trailing chunks are cut.
     """
-    result = rag.answer(
-        user_query=question,
-        source_name=file_id,
-        top_k=top_k
-    )
+    if file_id is not None:
+        file_id = _check_file_id(file_id)
+    try:
+        with tenants.query(tenant) as rag:
+            result = rag.answer(
+                user_query=question,
+                source_name=file_id,
+                top_k=top_k,
+                adaptive=adaptive,
+                min_k=min_k
+            )
+    except RateLimitExceeded as e:
+        raise _rate_limited(e)
     return result
 
 
+@app.post("/admin/reindex", dependencies=[Depends(require_admin)])
+def reindex():
+    """
+    Rebuild every tenant's collection with the current EMBED_MODEL (e.g. after
+    changing it). Each collection is swapped in only if all its files succeeded.
+    """
+    return tenants.reindex_all()
+
+
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "llm_hosts": tenants.llm.status(), "open_tenants": tenants.open_tenants()}
 
 # from fastapi import FastAPI, UploadFile, File
 # import uvicorn
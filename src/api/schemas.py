@@ -11,6 +11,7 @@ class IngestResponse(BaseModel):
     file_id: str
     source: str
     chunks: int
+    deduplicated: int = 0
     status: str
     entities: Optional[Dict[str, List[str]]] = None
 
@@ -21,12 +22,26 @@ class SourceItem(BaseModel):
     page: Optional[int] = None
     text: Optional[str] = None
     score: Optional[float] = None
+    refs: Optional[List[Dict[str, Any]]] = None
 
 
 class QueryResponse(BaseModel):
     answer: str
     sources: List[SourceItem]
     retrieved: int
+    k: Optional[int] = None
+    cutoff_reason: Optional[str] = None
+    route: Optional[str] = None
+    obligations: Optional[List[Dict[str, Any]]] = None
+
+
+class OverviewResponse(BaseModel):
+    source: str
+    status: str
+    summary: Optional[str] = None
+    sections: Optional[List[Dict[str, Any]]] = None
+    obligations: Optional[List[Dict[str, Any]]] = None
+    error: Optional[str] = None
 
 
 # Optional: for standardized errors if you want to return structured errors
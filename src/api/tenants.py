@@ -0,0 +1,255 @@
+"""
+Tenant isolation for the API.
+
+Each tenant gets its own collection, uploads and overviews directories, opened
+lazily and kept in an LRU of RagPipeline handles. Tenants share the embedding
+model and the LLM router.
+
+A tenant comes into existence on its first upload (its uploads directory is
+created then); other calls for an unknown tenant fail without creating
+anything. If TENANTS is configured, only those ids (and the default) are accepted.
+
+Per tenant, when configured (both are off by default, as before tenants existed):
+  - queries are rate limited by a token bucket (HTTP 429 when exhausted)
+  - at most TENANT_MAX_CONCURRENT_INGEST ingests run at once (HTTP 429 beyond that)
+
+Ingestion and overview builds run on a small shared worker pool, count against
+the ingest cap, and yield to in-flight interactive queries between stages and
+sections so /query latency is protected.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+import re
+import threading
+import time
+
+from src.rag.pipeline import RagPipeline
+from src.llm.router import LlmRouter
+from src.config import (
+    COLLECTION_NAME,
+    UPLOADS_DIR,
+    OVERVIEWS_DIR,
+    DEFAULT_TENANT,
+    TENANTS,
+    TENANT_MAX_OPEN,
+    TENANT_QUERY_RATE,
+    TENANT_QUERY_BURST,
+    TENANT_MAX_CONCURRENT_INGEST,
+    INGEST_WORKERS,
+    INGEST_YIELD_MAX_WAIT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Must start and end alphanumeric: tenant ids become part of Chroma collection names
+TENANT_ID_RE = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9_-]{0,46}[A-Za-z0-9])?$")
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class UnknownTenant(Exception):
+    pass
+
+
+class TokenBucket:
+    """A rate of 0 (or less) disables the limit."""
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    def is_full(self) -> bool:
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+
+class QueryPriorityGate:
+    """
+    Counts in-flight interactive queries; background work waits for them to drain.
+    """
+    def __init__(self):
+        self._active = 0
+        self._idle = threading.Condition()
+
+    @contextmanager
+    def interactive(self):
+        with self._idle:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._active -= 1
+                if self._active == 0:
+                    self._idle.notify_all()
+
+    def yield_to_queries(self, max_wait: float = INGEST_YIELD_MAX_WAIT):
+        # Bounded so a steady query stream cannot starve ingestion forever
+        with self._idle:
+            self._idle.wait_for(lambda: self._active == 0, timeout=max_wait)
+
+
+class TenantLimits:
+    def __init__(self):
+        self.query_bucket = TokenBucket(TENANT_QUERY_RATE, TENANT_QUERY_BURST)
+        # None: no cap on concurrent ingests
+        self.ingest_slots = (
+            threading.BoundedSemaphore(TENANT_MAX_CONCURRENT_INGEST) if TENANT_MAX_CONCURRENT_INGEST > 0 else None
+        )
+        self.ingests = 0  # guarded by TenantManager._lock
+
+    def idle(self) -> bool:
+        # Indistinguishable from fresh limits, so safe to forget
+        return self.ingests == 0 and self.query_bucket.is_full()
+
+
+class Tenant:
+    def __init__(self, tenant_id: str, rag: RagPipeline, limits: TenantLimits):
+        self.tenant_id = tenant_id
+        self.rag = rag
+        self.limits = limits
+
+
+def _migrate_root_overviews(overviews_dir: Path):
+    # Overviews built before tenants existed live directly under OVERVIEWS_DIR
+    if overviews_dir.exists() or not OVERVIEWS_DIR.is_dir():
+        return
+    overviews_dir.mkdir(parents=True)
+    for path in OVERVIEWS_DIR.glob("*.json"):
+        path.replace(overviews_dir / path.name)
+
+
+class TenantManager:
+    def __init__(self, max_open: int = TENANT_MAX_OPEN):
+        self.max_open = max_open
+        self.llm = LlmRouter()
+        self.gate = QueryPriorityGate()
+        self.ingest_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+
+        self._open: "OrderedDict[str, Tenant]" = OrderedDict()
+        # rate limiters and ingest caps outlive evicted handles until they are idle
+        self._limits: Dict[str, TenantLimits] = {}
+        self._lock = threading.Lock()
+
+    def _open_pipeline(self, tenant_id: str) -> RagPipeline:
+        # The default tenant keeps the original collection and uploads directory.
+        # Its overviews get their own subdirectory: the shared root would make
+        # every tenant's overviews reachable from the default tenant.
+        if tenant_id == DEFAULT_TENANT:
+            overviews_dir = OVERVIEWS_DIR / DEFAULT_TENANT
+            _migrate_root_overviews(overviews_dir)
+            return RagPipeline(overviews_dir=overviews_dir, llm=self.llm)
+        return RagPipeline(
+            collection_name=f"{COLLECTION_NAME}__{tenant_id}",
+            uploads_dir=UPLOADS_DIR / tenant_id,
+            overviews_dir=OVERVIEWS_DIR / tenant_id,
+            llm=self.llm,
+        )
+
+    def _exists(self, tenant_id: str) -> bool:
+        return tenant_id == DEFAULT_TENANT or (UPLOADS_DIR / tenant_id).is_dir()
+
+    def get(self, tenant_id: Optional[str] = None, create: bool = False) -> Tenant:
+        """
+        Raises ValueError for a malformed id and UnknownTenant for an id that is
+        not allowed or (unless create is set) has never uploaded anything.
+        """
+        tenant_id = tenant_id or DEFAULT_TENANT
+        if not TENANT_ID_RE.match(tenant_id):
+            raise ValueError(f"Invalid tenant id: {tenant_id!r}")
+        if TENANTS and tenant_id != DEFAULT_TENANT and tenant_id not in TENANTS:
+            raise UnknownTenant(f"Unknown tenant: {tenant_id}")
+
+        with self._lock:
+            tenant = self._open.get(tenant_id)
+            if tenant is not None:
+                self._open.move_to_end(tenant_id)
+                return tenant
+
+            if not self._exists(tenant_id):
+                if not create:
+                    raise UnknownTenant(f"Unknown tenant: {tenant_id}")
+                (UPLOADS_DIR / tenant_id).mkdir(parents=True, exist_ok=True)
+
+            rag = self._open_pipeline(tenant_id)
+            limits = self._limits.setdefault(tenant_id, TenantLimits())
+            tenant = Tenant(tenant_id, rag, limits)
+            self._open[tenant_id] = tenant
+            if len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+                self._forget_idle_limits()
+            return tenant
+
+    def _forget_idle_limits(self):
+        for tid in [t for t, limits in self._limits.items() if t not in self._open and limits.idle()]:
+            del self._limits[tid]
+
+    @contextmanager
+    def query(self, tenant: Tenant):
+        if not tenant.limits.query_bucket.try_acquire():
+            raise RateLimitExceeded(f"Query rate limit exceeded for tenant {tenant.tenant_id}")
+        with self.gate.interactive():
+            yield tenant.rag
+
+    def begin_ingest(self, tenant: Tenant):
+        slots = tenant.limits.ingest_slots
+        if slots is not None and not slots.acquire(blocking=False):
+            raise RateLimitExceeded(f"Ingest concurrency limit reached for tenant {tenant.tenant_id}")
+        with self._lock:
+            tenant.limits.ingests += 1
+
+    def end_ingest(self, tenant: Tenant):
+        with self._lock:
+            tenant.limits.ingests -= 1
+        if tenant.limits.ingest_slots is not None:
+            tenant.limits.ingest_slots.release()
+
+    def known_tenants(self) -> List[str]:
+        # The default tenant plus every tenant created by an upload
+        found = [
+            d.name for d in sorted(UPLOADS_DIR.iterdir())
+            if d.is_dir() and TENANT_ID_RE.match(d.name) and d.name != DEFAULT_TENANT
+            and (not TENANTS or d.name in TENANTS)
+        ] if UPLOADS_DIR.is_dir() else []
+        return [DEFAULT_TENANT] + found
+
+    def reindex_all(self) -> Dict[str, Dict]:
+        """
+        Rebuild every tenant's collection with the current embedding model
+        (see RagPipeline.reindex_all). A failing tenant does not stop the others.
+        """
+        results: Dict[str, Dict] = {}
+        for tenant_id in self.known_tenants():
+            try:
+                results[tenant_id] = self.get(tenant_id).rag.reindex_all()
+            except Exception as e:
+                logger.exception("Reindex of tenant %s failed", tenant_id)
+                results[tenant_id] = {"swapped": False, "error": str(e)}
+        return results
+
+    def open_tenants(self):
+        with self._lock:
+            return list(self._open.keys())
@@ -7,12 +7,14 @@ DATA_DIR = PROJECT_ROOT / "data"
 RAW_DIR = DATA_DIR / "raw"
 UPLOADS_DIR = DATA_DIR / "uploads"
 CHROMA_DIR = PROJECT_ROOT / "chroma_db"
+ARTIFACTS_DIR = DATA_DIR / "artifacts"
 
 COLLECTION_NAME = os.getenv("COLLECTION_NAME", "legal_documents")
 EMBED_MODEL = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
 
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1:8b")
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+OLLAMA_TIMEOUT_SECONDS = float(os.getenv("OLLAMA_TIMEOUT_SECONDS", "300"))  # per request, so a hung host can be retried
 
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
@@ -20,3 +22,43 @@ MIN_PAGE_CHARS = int(os.getenv("MIN_PAGE_CHARS", "50"))
 MIN_CHUNK_CHARS = int(os.getenv("MIN_CHUNK_CHARS", "100"))
 
 DEFAULT_TOP_K = int(os.getenv("DEFAULT_TOP_K", "10"))
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+DEDUP_MIN_JACCARD = float(os.getenv("DEDUP_MIN_JACCARD", "0.8"))  # shingle similarity at which retrieved chunks are collapsed
+DEDUP_OVERFETCH_FACTOR = int(os.getenv("DEDUP_OVERFETCH_FACTOR", "2"))  # retrieve top_k * factor, collapse, trim
+
+ADAPTIVE_MIN_K = int(os.getenv("ADAPTIVE_MIN_K", "2"))
+ADAPTIVE_SCORE_GAP = float(os.getenv("ADAPTIVE_SCORE_GAP", "0.15"))
+ADAPTIVE_MAX_DROP = float(os.getenv("ADAPTIVE_MAX_DROP", "0.35"))
+
+OVERVIEWS_DIR = DATA_DIR / "overviews"
+OVERVIEW_SECTION_CHARS = int(os.getenv("OVERVIEW_SECTION_CHARS", "6000"))
+OVERVIEW_BUILD_TIMEOUT = int(os.getenv("OVERVIEW_BUILD_TIMEOUT", "3600"))  # "building" older than this is reported failed
+
+# Comma-separated pool of Ollama endpoints; defaults to the single OLLAMA_HOST
+OLLAMA_HOSTS = [h.strip() for h in os.getenv("OLLAMA_HOSTS", OLLAMA_HOST).split(",") if h.strip()]
+OLLAMA_MAX_CONCURRENCY_PER_HOST = int(os.getenv("OLLAMA_MAX_CONCURRENCY_PER_HOST", "2"))
+OLLAMA_RESERVED_INTERACTIVE_SLOTS = int(os.getenv("OLLAMA_RESERVED_INTERACTIVE_SLOTS", "1"))  # per host, never used by background work
+OLLAMA_MAX_RETRIES = int(os.getenv("OLLAMA_MAX_RETRIES", "2"))
+OLLAMA_HEDGE_AFTER_SECONDS = float(os.getenv("OLLAMA_HEDGE_AFTER_SECONDS", "0"))  # 0 disables hedging
+OLLAMA_HEALTH_INTERVAL_SECONDS = float(os.getenv("OLLAMA_HEALTH_INTERVAL_SECONDS", "30"))
+OLLAMA_FAST_MODEL = os.getenv("OLLAMA_FAST_MODEL", "")  # empty disables the fast path
+FAST_PATH_MAX_QUESTION_WORDS = int(os.getenv("FAST_PATH_MAX_QUESTION_WORDS", "12"))
+
+ARTIFACT_CACHE_ENABLED = os.getenv("ARTIFACT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Token for /admin endpoints (X-Admin-Token header); empty disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Multi-tenancy: tenant id comes from the X-Tenant-ID header
+DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", "default")
+# Comma-separated allowlist of tenant ids; empty allows any tenant created by an upload
+TENANTS = [t.strip() for t in os.getenv("TENANTS", "").split(",") if t.strip()]
+TENANT_MAX_OPEN = int(os.getenv("TENANT_MAX_OPEN", "16"))  # open collection handles kept in the LRU
+TENANT_QUERY_RATE = float(os.getenv("TENANT_QUERY_RATE", "0"))  # queries per second per tenant; 0 = unlimited
+TENANT_QUERY_BURST = int(os.getenv("TENANT_QUERY_BURST", "10"))
+TENANT_MAX_CONCURRENT_INGEST = int(os.getenv("TENANT_MAX_CONCURRENT_INGEST", "0"))  # 0 = unlimited
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))  # background ingest threads shared by all tenants
+INGEST_YIELD_MAX_WAIT = float(os.getenv("INGEST_YIELD_MAX_WAIT", "5"))  # max seconds ingest waits for queries per stage
+INGEST_JOB_TTL_SECONDS = float(os.getenv("INGEST_JOB_TTL_SECONDS", "3600"))  # finished background jobs are pollable this long
+INGEST_JOBS_MAX = int(os.getenv("INGEST_JOBS_MAX", "1000"))  # finished jobs kept at most
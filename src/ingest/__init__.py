@@ -1,5 +1,6 @@
 from .pdf_loader import load_pdf_and_texts
 from .chunking import validate_chunks
 from .entities import extract_entities
+from .dedup import text_hash, collapse_near_duplicates
 
-__all__ = ["load_pdf_and_texts", "validate_chunks", "extract_entities"]
\ No newline at end of file
+__all__ = ["load_pdf_and_texts", "validate_chunks", "extract_entities", "text_hash", "collapse_near_duplicates"]
\ No newline at end of file
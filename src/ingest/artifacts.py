@@ -0,0 +1,137 @@
+"""
+On-disk cache of ingestion artifacts, so re-ingesting a PDF skips parsing and chunking.
+
+Layout under the artifacts directory (gzip-compressed JSON):
+  pages/<file_hash>.json.gz
+      [{"page": 1, "text": "..."}, ...]
+  chunks/<file_hash>_<chunk_size>_<chunk_overlap>_v<CHUNKER_VERSION>.json.gz
+      [[page_idx, start, end, chunk_index], ...]   offsets into the cached page texts
+
+Pages are keyed by file content only; chunks are also keyed by the chunking
+parameters, so changing the embedding model reuses both, and changing the
+chunk settings reuses the parsed pages.
+
+The cache is shared by all tenants, so the same file may be written
+concurrently. Writes go through a unique temp file and are best-effort: an
+unreadable entry or a failed write is logged and ingestion carries on.
+"""
+
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from src.ingest.chunking import CHUNKER_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+def file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _read(path: Path):
+    if not path.exists():
+        return None
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, EOFError, ValueError) as e:
+        # EOFError: truncated gzip stream
+        logger.warning("Ignoring unreadable artifact %s: %s", path, e)
+        return None
+
+
+def _write(path: Path, data):
+    tmp_name = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.name + ".", suffix=".tmp", delete=False) as raw:
+            tmp_name = raw.name
+            with gzip.open(raw, "wt", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_name, path)
+    except OSError as e:
+        logger.warning("Could not cache artifact %s: %s", path, e)
+        if tmp_name:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+
+
+def _pages_path(artifacts_dir: Path, fhash: str) -> Path:
+    return artifacts_dir / "pages" / f"{fhash}.json.gz"
+
+
+def _chunks_path(artifacts_dir: Path, fhash: str, chunk_size: int, chunk_overlap: int) -> Path:
+    return artifacts_dir / "chunks" / f"{fhash}_{chunk_size}_{chunk_overlap}_v{CHUNKER_VERSION}.json.gz"
+
+
+def load_pages(artifacts_dir: Path, fhash: str) -> Optional[List[Dict]]:
+    return _read(_pages_path(artifacts_dir, fhash))
+
+
+def save_pages(artifacts_dir: Path, fhash: str, pages: List[Dict]):
+    _write(_pages_path(artifacts_dir, fhash), [{"page": p.get("page"), "text": p.get("text", "")} for p in pages])
+
+
+def save_chunks(artifacts_dir: Path, fhash: str, chunk_size: int, chunk_overlap: int, pages: List[Dict], split_texts: List[Dict]):
+    page_index = {p.get("page"): i for i, p in enumerate(pages)}
+    cursors: Dict[int, int] = {}
+    rows = []
+
+    for chunk in split_texts:
+        idx = page_index.get(chunk.get("page"))
+        if idx is None:
+            return  # chunk does not map onto the cached pages; don't cache a partial result
+        text = pages[idx].get("text", "") or ""
+        # Chunks are stripped substrings of their page, in order (overlap can step back)
+        start = text.find(chunk["text"], max(0, cursors.get(idx, 0) - chunk_size))
+        if start < 0:
+            start = text.find(chunk["text"])
+        if start < 0:
+            return
+        end = start + len(chunk["text"])
+        cursors[idx] = end
+        rows.append([idx, start, end, chunk.get("chunk_index")])
+
+    _write(_chunks_path(artifacts_dir, fhash, chunk_size, chunk_overlap), rows)
+
+
+def load_chunks(artifacts_dir: Path, fhash: str, chunk_size: int, chunk_overlap: int, pages: List[Dict], source_name: str) -> Optional[Tuple[List[Dict], List[Dict]]]:
+    """
+    Rebuild (split_texts, chunk_metadatas) as validate_chunks would return them.
+    """
+    rows = _read(_chunks_path(artifacts_dir, fhash, chunk_size, chunk_overlap))
+    if rows is None:
+        return None
+
+    split_texts: List[Dict] = []
+    chunk_metadatas: List[Dict] = []
+    for idx, start, end, chunk_index in rows:
+        page = pages[idx]
+        content = (page.get("text", "") or "")[start:end]
+        split_texts.append({
+            "text": content,
+            "source": source_name,
+            "page": page.get("page"),
+            "chunk_index": chunk_index,
+        })
+        chunk_metadatas.append({
+            "source": source_name,
+            "page": page.get("page"),
+            "chunk_length": len(content),
+            "word_count": len(content.split()),
+            "chunk_index": chunk_index,
+        })
+
+    return split_texts, chunk_metadatas
@@ -24,6 +24,9 @@ except Exception as e:
 
 logger = logging.getLogger(__name__)
 
+# Bump when chunking output changes, so cached chunk artifacts are not reused
+CHUNKER_VERSION = 1
+
 
 def validate_chunks(
     all_texts: List[Dict],
@@ -0,0 +1,96 @@
+"""
+Duplicate handling for chunks.
+
+Legal corpora repeat the same boilerplate (governing law, notices, severability)
+across many contracts. Two levels are used:
+
+  - storage: chunks whose normalized text is identical are stored once and
+    carry back-references to every source/page containing them. Only identical
+    text is shared, so citing the shared chunk for any of its sources is exact.
+  - results: retrieved chunks whose word 3-shingles have a Jaccard similarity
+    of at least `min_jaccard` are collapsed into the best-ranked copy. This only
+    affects ranking and display; a near-duplicate (e.g. the same clause naming
+    another county) never lends its text or references to another document.
+"""
+
+from typing import List, Dict, Set
+import hashlib
+import re
+
+_TOKEN_RE = re.compile(r"\w+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    # Whitespace and case only; punctuation and numbers matter in legal text
+    return _SPACE_RE.sub(" ", text or "").strip().casefold()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def _hash64(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shingles(text: str, shingle_size: int = 3) -> Set[int]:
+    tokens = _TOKEN_RE.findall((text or "").lower())
+    if not tokens:
+        return set()
+    if len(tokens) < shingle_size:
+        return {_hash64(" ".join(tokens))}
+    return {_hash64(" ".join(tokens[i:i + shingle_size])) for i in range(len(tokens) - shingle_size + 1)}
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def validate_min_jaccard(min_jaccard: float) -> float:
+    if not 0.0 < min_jaccard <= 1.0:
+        raise ValueError(f"min_jaccard must be in (0, 1], got {min_jaccard}")
+    return min_jaccard
+
+
+def _own_refs(candidate: Dict) -> List[Dict]:
+    return candidate.get("refs") or [{"source": candidate.get("source"), "page": candidate.get("page")}]
+
+
+def collapse_near_duplicates(candidates: List[Dict], min_jaccard: float = 0.8) -> List[Dict]:
+    """
+    Collapse near-identical retrieved chunks, keeping the first (best-ranked) copy.
+
+    Sources and pages of dropped copies are merged into the kept chunk's "refs"
+    only when their text is identical to it; other near-duplicates are just dropped.
+    """
+    kept: List[Dict] = []
+    kept_shingles: List[Set[int]] = []
+    kept_norm: List[str] = []
+
+    for c in candidates:
+        text = c.get("text") or ""
+        sh = shingles(text)
+        match = None
+        for i, other in enumerate(kept_shingles):
+            if jaccard(sh, other) >= min_jaccard:
+                match = i
+                break
+
+        if match is None:
+            c["refs"] = list(_own_refs(c))
+            kept.append(c)
+            kept_shingles.append(sh)
+            kept_norm.append(normalize_text(text))
+            continue
+
+        if normalize_text(text) != kept_norm[match]:
+            continue
+        refs = kept[match]["refs"]
+        for ref in _own_refs(c):
+            if ref not in refs:
+                refs.append(ref)
+
+    return kept
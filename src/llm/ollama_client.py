@@ -1,5 +1,9 @@
+from functools import lru_cache
+from typing import Optional
 import requests
 
+from src.config import OLLAMA_HOST, OLLAMA_TIMEOUT_SECONDS
+
 def check_ollama(host: str) -> bool:
     try:
         r = requests.get(host, timeout=1)
@@ -7,9 +11,20 @@ def check_ollama(host: str) -> bool:
     except Exception:
         return False
 
-def chat(model: str, prompt: str, temperature: float = 0.1, num_predict: int = 512) -> str:
+def is_unreachable_error(e: BaseException) -> bool:
+    # Connection / timeout failures mean the host is down; anything else
+    # (e.g. ResponseError 404 "model not found") is a per-request error
+    import httpx
+    return isinstance(e, (ConnectionError, TimeoutError, httpx.TransportError))
+
+@lru_cache()
+def get_client(host: str):
     import ollama
-    resp = ollama.chat(
+    return ollama.Client(host=host, timeout=OLLAMA_TIMEOUT_SECONDS)
+
+def chat(model: str, prompt: str, temperature: float = 0.1, num_predict: int = 512, host: Optional[str] = None) -> str:
+    client = get_client(host or OLLAMA_HOST)
+    resp = client.chat(
         model=model,
         messages=[{"role": "user", "content": prompt}],
         options={"temperature": temperature, "num_predict": num_predict}
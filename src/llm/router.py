@@ -0,0 +1,214 @@
+"""
+Routes chat requests across a pool of Ollama hosts.
+
+- Load balancing: each request goes to the healthy host with the fewest
+  requests queued or in flight.
+- Concurrency limits: each host runs at most `max_concurrency` generations;
+  extra requests wait on that host's semaphore (and count towards its queue depth).
+- Priority: background requests (e.g. overview builds) may only use
+  `max_concurrency - reserved_interactive` slots per host (at least one), so
+  interactive queries always find a free slot.
+- Health: hosts that cannot be reached (connection error or timeout) are marked
+  down and re-probed with check_ollama once `health_interval` seconds have passed.
+  Probes run on the router's worker pool, one at a time per host, never on the
+  request path. Other errors (e.g. model not pulled on that host) only fail the request.
+- Retries and hedging: a failed request is retried on another host; if
+  `hedge_after` > 0 and a request is still running after that many seconds,
+  a duplicate is sent to a second host and the first answer wins.
+- Fast path: short factual questions can be sent to a smaller model. If that
+  model fails on every host for a reason other than connectivity (e.g. it was
+  never pulled), the request falls back to the default model and the fast path
+  is skipped for `health_interval` seconds.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional
+import logging
+import re
+import threading
+import time
+
+from src.llm.ollama_client import chat, check_ollama, is_unreachable_error
+from src.config import (
+    OLLAMA_HOSTS,
+    OLLAMA_MAX_CONCURRENCY_PER_HOST,
+    OLLAMA_RESERVED_INTERACTIVE_SLOTS,
+    OLLAMA_MAX_RETRIES,
+    OLLAMA_HEDGE_AFTER_SECONDS,
+    OLLAMA_HEALTH_INTERVAL_SECONDS,
+    OLLAMA_FAST_MODEL,
+    FAST_PATH_MAX_QUESTION_WORDS,
+)
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+_FACTUAL_QUERY_RE = re.compile(r"^\s*(who|what|when|where|which|how (much|many|long)|is|are|does|do)\b", re.I)
+
+
+def is_short_factual(question: str, max_words: int = FAST_PATH_MAX_QUESTION_WORDS) -> bool:
+    return len(question.split()) <= max_words and bool(_FACTUAL_QUERY_RE.match(question))
+
+
+class OllamaHost:
+    def __init__(self, url: str, max_concurrency: int, reserved_interactive: int = 0):
+        self.url = url
+        self.slots = threading.Semaphore(max_concurrency)
+        self.background_slots = threading.Semaphore(max(1, max_concurrency - reserved_interactive))
+        self.queued = 0  # waiting for a slot or generating
+        self.healthy = True
+        self.last_failure = 0.0
+        self.probing = False
+
+    def status(self) -> Dict:
+        return {"host": self.url, "healthy": self.healthy, "queued": self.queued}
+
+
+class LlmRouter:
+    def __init__(self,
+                 hosts: Optional[List[str]] = None,
+                 max_concurrency: Optional[int] = None,
+                 max_retries: Optional[int] = None,
+                 hedge_after: Optional[float] = None,
+                 health_interval: Optional[float] = None,
+                 fast_model: Optional[str] = None,
+                 reserved_interactive: Optional[int] = None,
+    ):
+        max_concurrency = max_concurrency or OLLAMA_MAX_CONCURRENCY_PER_HOST
+        reserved_interactive = OLLAMA_RESERVED_INTERACTIVE_SLOTS if reserved_interactive is None else reserved_interactive
+        self.hosts = [OllamaHost(h, max_concurrency, reserved_interactive) for h in (hosts or OLLAMA_HOSTS)]
+        self.max_retries = OLLAMA_MAX_RETRIES if max_retries is None else max_retries
+        self.hedge_after = OLLAMA_HEDGE_AFTER_SECONDS if hedge_after is None else hedge_after
+        self.health_interval = OLLAMA_HEALTH_INTERVAL_SECONDS if health_interval is None else health_interval
+        self.fast_model = OLLAMA_FAST_MODEL if fast_model is None else fast_model
+
+        self._fast_model_failed_at: Optional[float] = None
+
+        self._lock = threading.Lock()
+        # hedged duplicates and health probes run here so the caller can return on the first answer
+        self._executor = ThreadPoolExecutor(max_workers=max(2, 2 * len(self.hosts) * max_concurrency))
+
+    # -----------------------
+    # Host selection / health
+    # -----------------------
+    def _refresh_health(self):
+        now = time.monotonic()
+        with self._lock:
+            due = [h for h in self.hosts if not h.healthy and not h.probing and now - h.last_failure >= self.health_interval]
+            for host in due:
+                host.probing = True
+        for host in due:
+            self._executor.submit(self._probe, host)
+
+    def _probe(self, host: OllamaHost):
+        healthy = check_ollama(host.url)
+        with self._lock:
+            host.healthy = healthy
+            if not healthy:
+                host.last_failure = time.monotonic()
+            host.probing = False
+
+    def _pick(self, exclude: List[OllamaHost], allow_reuse: bool = True) -> Optional[OllamaHost]:
+        self._refresh_health()
+        with self._lock:
+            candidates = [h for h in self.hosts if h not in exclude]
+            # Retries may go back to an already-tried host when the pool is exhausted
+            if not candidates and allow_reuse:
+                candidates = list(self.hosts)
+            # If every host is marked down, still try one rather than fail outright
+            pool = [h for h in candidates if h.healthy] or candidates
+            if not pool:
+                return None
+            host = min(pool, key=lambda h: h.queued)
+            host.queued += 1
+            return host
+
+    def _mark_failed(self, host: OllamaHost):
+        host.healthy = False
+        host.last_failure = time.monotonic()
+
+    def _run(self, host: OllamaHost, model: str, prompt: str, temperature: float, num_predict: int, priority: str = INTERACTIVE) -> str:
+        # host.queued was already incremented by _pick
+        try:
+            if priority == BACKGROUND:
+                with host.background_slots, host.slots:
+                    return chat(model, prompt, temperature=temperature, num_predict=num_predict, host=host.url)
+            with host.slots:
+                return chat(model, prompt, temperature=temperature, num_predict=num_predict, host=host.url)
+        except Exception as e:
+            if is_unreachable_error(e):
+                self._mark_failed(host)
+            raise
+        finally:
+            with self._lock:
+                host.queued -= 1
+
+    # -----------------------
+    # Public API
+    # -----------------------
+    def select_model(self, question: str, default_model: str) -> str:
+        failed_at = self._fast_model_failed_at
+        if failed_at is not None and time.monotonic() - failed_at < self.health_interval:
+            return default_model
+        if self.fast_model and is_short_factual(question):
+            return self.fast_model
+        return default_model
+
+    def chat(self, model: str, prompt: str, temperature: float = 0.1, num_predict: int = 512,
+             priority: str = INTERACTIVE, fallback_model: Optional[str] = None) -> str:
+        """
+        If `model` fails on every host with a non-connection error and a different
+        `fallback_model` is given, the request is retried with `fallback_model`.
+        """
+        try:
+            return self._chat(model, prompt, temperature, num_predict, priority)
+        except RuntimeError as e:
+            if not fallback_model or fallback_model == model or e.__cause__ is None or is_unreachable_error(e.__cause__):
+                raise
+            logger.warning("Model %s failed on all hosts (%s); falling back to %s", model, e.__cause__, fallback_model)
+            if model == self.fast_model:
+                self._fast_model_failed_at = time.monotonic()
+            return self._chat(fallback_model, prompt, temperature, num_predict, priority)
+
+    def _chat(self, model: str, prompt: str, temperature: float, num_predict: int, priority: str) -> str:
+        tried: List[OllamaHost] = []
+        last_error: Optional[Exception] = None
+
+        for _ in range(self.max_retries + 1):
+            host = self._pick(tried)
+            if host is None:
+                break
+            tried.append(host)
+
+            if self.hedge_after <= 0:
+                try:
+                    return self._run(host, model, prompt, temperature, num_predict, priority)
+                except Exception as e:
+                    logger.warning("Ollama request failed on %s: %s", host.url, e)
+                    last_error = e
+                    continue
+
+            # Hedged: start on one host, duplicate to a second if it is slow
+            futures = [self._executor.submit(self._run, host, model, prompt, temperature, num_predict, priority)]
+            done, _ = wait(futures, timeout=self.hedge_after)
+            if not done:
+                backup = self._pick(tried, allow_reuse=False)
+                if backup is not None:
+                    tried.append(backup)
+                    futures.append(self._executor.submit(self._run, backup, model, prompt, temperature, num_predict, priority))
+
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    if f.exception() is None:
+                        return f.result()
+                    logger.warning("Ollama request failed: %s", f.exception())
+                    last_error = f.exception()
+
+        raise RuntimeError(f"All Ollama hosts failed: {last_error}") from last_error
+
+    def status(self) -> List[Dict]:
+        return [h.status() for h in self.hosts]
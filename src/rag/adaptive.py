@@ -0,0 +1,41 @@
+"""
+Adaptive cut-off for retrieved chunks.
+
+Retrieval over-fetches up to `max_k` candidates (sorted best first), then keeps
+only the head of the list: it stops at the first large gap between consecutive
+scores, or once a score falls too far below the best one. At least `min_k`
+chunks are always kept.
+
+Returns (k, reason) where reason is one of:
+  "score_gap", "relative_threshold", "max_k", "exhausted", "no_scores"
+"""
+
+from typing import List, Optional, Tuple
+
+
+def select_adaptive_k(
+    scores: List[Optional[float]],
+    min_k: int,
+    max_k: int,
+    score_gap: float,
+    max_drop: float,
+) -> Tuple[int, str]:
+
+    n = min(len(scores), max_k)
+    min_k = max(1, min(min_k, n))
+
+    if n == 0:
+        return 0, "exhausted"
+
+    # Without scores there is nothing to cut on
+    if any(s is None for s in scores[:n]):
+        return n, "no_scores"
+
+    best = scores[0]
+    for i in range(min_k, n):
+        if scores[i - 1] - scores[i] > score_gap:
+            return i, "score_gap"
+        if best - scores[i] > max_drop:
+            return i, "relative_threshold"
+
+    return n, ("max_k" if n == max_k else "exhausted")
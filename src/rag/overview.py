@@ -0,0 +1,208 @@
+"""
+Precomputed per-document overviews.
+
+After ingestion, a document can be map-reduced through the LLM once:
+  - map: each section (a run of consecutive pages) is summarized and its obligations listed
+  - reduce: section summaries are merged into one document summary
+
+The result is persisted as JSON per source so whole-document requests
+("summarize this agreement", "list all obligations of the buyer") are served
+without retrieval or generation. Any other question goes through retrieval.
+
+Overview JSON:
+  {"source": ..., "status": "building" | "ready" | "failed", "started_at": ...,
+   "summary": "...",
+   "sections": [{"pages": [first, last], "summary": "..."}],
+   "obligations": [{"party": "...", "obligation": "...", "pages": [first, last]}]}
+"""
+
+from typing import Callable, Dict, List, Optional
+from pathlib import Path
+import json
+import logging
+import re
+import time
+
+from src.rag.prompts import generate_section_summary_prompt, generate_document_summary_prompt
+
+logger = logging.getLogger(__name__)
+
+# Only whole-document requests are routed; specific questions go to retrieval
+_DOC = r"(this|the)\s+(agreement|contract|document|lease|deed|policy|instrument)"
+_END = r"\s*[?.!]*\s*$"
+_SUMMARY_QUERY_RE = re.compile(
+    r"^\s*(please\s+)?("
+    r"summari[sz]e\s+" + _DOC +
+    r"|(give|provide|write)(\s+me)?\s+(a|an)\s+(brief\s+|short\s+)?(summary|overview)\s+of\s+" + _DOC +
+    r"|what\s+is\s+" + _DOC + r"\s+about"
+    r")" + _END,
+    re.I,
+)
+_OBLIGATION_QUERY_RE = re.compile(
+    r"^\s*(please\s+)?(list|show|what\s+are)(\s+me)?\s+(all\s+)?(of\s+)?(the\s+)?obligations"
+    r"(\s+of\s+(the\s+)?(?P<party>[\w .&'-]+?))?"
+    r"(\s+(in|under)\s+" + _DOC + r")?" + _END,
+    re.I,
+)
+
+
+def split_sections(pages: List[Dict], max_chars: int) -> List[Dict]:
+    # Pages longer than max_chars are split into several pieces so no text is dropped
+    pieces: List[Dict] = []
+    for p in pages:
+        text = p.get("text", "") or ""
+        for start in range(0, max(len(text), 1), max_chars):
+            pieces.append({"page": p.get("page"), "text": text[start:start + max_chars]})
+
+    sections: List[List[Dict]] = []
+    current: List[Dict] = []
+    size = 0
+    for piece in pieces:
+        if current and size + len(piece["text"]) > max_chars:
+            sections.append(current)
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece["text"])
+    if current:
+        sections.append(current)
+
+    return [
+        {
+            "pages": [s[0].get("page"), s[-1].get("page")],
+            "text": "\n\n".join(p["text"] for p in s),
+        }
+        for s in sections
+    ]
+
+
+def _parse_section_output(output: str, pages: List) -> Dict:
+    summary_lines: List[str] = []
+    obligations: List[Dict] = []
+
+    for line in (output or "").splitlines():
+        line = line.strip().lstrip("-*• ").strip()
+        if not line:
+            continue
+        if line.upper().startswith("OBLIGATION:"):
+            party, sep, what = line[len("OBLIGATION:"):].partition("|")
+            if sep and what.strip():
+                obligations.append({"party": party.strip(), "obligation": what.strip(), "pages": pages})
+            continue
+        if line.upper().startswith("SUMMARY:"):
+            line = line[len("SUMMARY:"):].strip()
+        summary_lines.append(line)
+
+    return {"summary": " ".join(summary_lines), "obligations": obligations}
+
+
+def build_overview(chat_fn: Callable[..., str], model: str, source_name: str, pages: List[Dict], section_chars: int,
+                   progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """
+    `progress(done, total)` is called before each LLM call, so the caller can
+    yield to interactive work between sections.
+    """
+    sections_out: List[Dict] = []
+    obligations: List[Dict] = []
+    sections = split_sections(pages, section_chars)
+
+    # Map: one LLM call per section
+    for i, section in enumerate(sections):
+        if progress:
+            progress(i, len(sections))
+        prompt = generate_section_summary_prompt(section["text"], f"{section['pages'][0]}-{section['pages'][1]}")
+        output = chat_fn(model, prompt, temperature=0.0, num_predict=512)
+        parsed = _parse_section_output(output, section["pages"])
+        sections_out.append({"pages": section["pages"], "summary": parsed["summary"]})
+        obligations.extend(parsed["obligations"])
+
+    # Reduce: merge section summaries into one document summary
+    summary = ""
+    if len(sections_out) == 1:
+        summary = sections_out[0]["summary"]
+    elif sections_out:
+        if progress:
+            progress(len(sections), len(sections))
+        joined = "\n\n".join(f"[pages {s['pages'][0]}-{s['pages'][1]}] {s['summary']}" for s in sections_out)
+        summary = chat_fn(model, generate_document_summary_prompt(joined), temperature=0.0, num_predict=512).strip()
+
+    return {
+        "source": source_name,
+        "status": "ready",
+        "summary": summary,
+        "sections": sections_out,
+        "obligations": obligations,
+    }
+
+
+def overview_path(overviews_dir: Path, source_name: str) -> Path:
+    return overviews_dir / f"{source_name}.json"
+
+
+def save_overview(overviews_dir: Path, source_name: str, overview: Dict):
+    overviews_dir.mkdir(parents=True, exist_ok=True)
+    path = overview_path(overviews_dir, source_name)
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(overview), encoding="utf-8")
+    tmp.replace(path)
+
+
+def building_overview(source_name: str) -> Dict:
+    return {"source": source_name, "status": "building", "started_at": time.time()}
+
+
+def load_overview(overviews_dir: Path, source_name: str, stale_after: Optional[float] = None) -> Optional[Dict]:
+    """
+    A "building" overview older than `stale_after` seconds is reported as failed
+    (its worker crashed or the server restarted mid-build).
+    """
+    path = overview_path(overviews_dir, source_name)
+    if not path.exists():
+        return None
+    try:
+        overview = json.loads(path.read_text(encoding="utf-8"))
+    except ValueError as e:
+        logger.warning("Unreadable overview for %s: %s", source_name, e)
+        return None
+
+    if stale_after is not None and overview.get("status") == "building":
+        if time.time() - overview.get("started_at", 0) > stale_after:
+            overview["status"] = "failed"
+            overview["error"] = "overview build did not finish; ingest again with summarize=true"
+    return overview
+
+
+def _normalize_party(party: str) -> str:
+    party = party.strip().lower()
+    return party[4:] if party.startswith("the ") else party
+
+
+def answer_from_overview(user_query: str, overview: Dict) -> Optional[Dict]:
+    """
+    Answer summary / obligation questions from a ready overview.
+    Returns None when the question is not an overview question.
+    """
+    if not overview or overview.get("status") != "ready":
+        return None
+
+    m = _OBLIGATION_QUERY_RE.match(user_query)
+    if m:
+        obligations = overview.get("obligations") or []
+        party = _normalize_party(m.group("party") or "")
+        selected = obligations
+        if party:
+            # "obligations of the buyer": keep obligations whose party names that party
+            selected = [o for o in obligations if o.get("party") and party in _normalize_party(o["party"])]
+            if not selected:
+                return None  # unknown party; let retrieval look for it
+        if not selected:
+            answer = "No obligations were identified in this document."
+        else:
+            answer = "\n".join(
+                f"- {o['party']}: {o['obligation']} (pages {o['pages'][0]}-{o['pages'][1]})" for o in selected
+            )
+        return {"answer": answer, "obligations": selected}
+
+    if _SUMMARY_QUERY_RE.match(user_query):
+        return {"answer": overview.get("summary", ""), "obligations": None}
+
+    return None
@@ -1,56 +1,43 @@
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Tuple
+import functools
+import json
+import logging
 from pathlib import Path
 
 from src.ingest.pdf_loader import load_pdf_and_texts
 from src.ingest.chunking import validate_chunks
 from src.ingest.entities import extract_entities
+from src.ingest.dedup import collapse_near_duplicates, validate_min_jaccard
+from src.ingest.artifacts import file_hash, load_pages, save_pages, load_chunks, save_chunks
 from src.rag.prompts import generate_prompt
-from src.config import CHROMA_DIR, EMBED_MODEL, COLLECTION_NAME, OLLAMA_MODEL, CHUNK_SIZE, CHUNK_OVERLAP, UPLOADS_DIR
+from src.llm.router import LlmRouter, BACKGROUND
+from src.rag.adaptive import select_adaptive_k
+from src.rag.overview import build_overview, building_overview, save_overview, load_overview, answer_from_overview
+from src.config import CHROMA_DIR, EMBED_MODEL, COLLECTION_NAME, OLLAMA_MODEL, CHUNK_SIZE, CHUNK_OVERLAP, UPLOADS_DIR, DEDUP_ENABLED, DEDUP_MIN_JACCARD, DEDUP_OVERFETCH_FACTOR, ADAPTIVE_MIN_K, ADAPTIVE_SCORE_GAP, ADAPTIVE_MAX_DROP, OVERVIEWS_DIR, OVERVIEW_SECTION_CHARS, OVERVIEW_BUILD_TIMEOUT, ARTIFACTS_DIR, ARTIFACT_CACHE_ENABLED
 
 # vectorstore helper functions (from your file)
-from src.vectorstore.chroma_store import get_collection, upsert_document, retrieve
-
-# Try to import your wrapper chat function if present; otherwise fall back to ollama.chat
-def _load_ollama_chat():
-    # Try a few possible module paths for the user's client wrapper
-    candidates = [
-        "llm.ollama_client",   # common snake_case module name
-        "llm.ollama.client",   # if filename had a dot (less common)
-        "llm.ollama",          # alternative
-    ]
-    for modname in candidates:
-        try:
-            import importlib
-            mod = importlib.import_module(modname)
-            if hasattr(mod, "chat"):
-                return getattr(mod, "chat")
-        except Exception:
-            continue
-
-    # Fallback: try the official ollama package (must be installed per requirements)
-    try:
-        import ollama as _ollama
-
-        def _ollama_chat(model: str, prompt: str, temperature: float = 0.1, num_predict: int = 512) -> str:
-            resp = _ollama.chat(
-                model=model,
-                messages=[{"role": "user", "content": prompt}],
-                options={"temperature": temperature, "num_predict": num_predict},
-            )
-            # defensive extraction
-            return (resp.get("message", {}) or {}).get("content", str(resp))
+from src.vectorstore.chroma_store import (
+    get_collection,
+    create_fresh_collection,
+    drop_collection,
+    swap_collection,
+    upsert_document,
+    upsert_document_dedup,
+    retrieve,
+    EmbeddingModelMismatch,
+)
+
+logger = logging.getLogger(__name__)
 
-        return _ollama_chat
-    except Exception as e:
-        # If nothing available, raise an informative error
-        raise ImportError(
-            "Could not import a chat() function for Ollama. "
-            "Ensure your llm wrapper (llm/ollama.client.py) is importable or that 'ollama' package is installed."
-        ) from e
+REINDEX_HINT = "Rebuild it with `python -m src.reindex` (server stopped) or POST /admin/reindex."
 
 
-# instantiate chat function once
-_ollama_chat = _load_ollama_chat()
+def _label_with_source(candidate: Dict, source_name: str):
+    for ref in candidate.get("refs") or []:
+        if ref.get("source") == source_name:
+            candidate["source"] = ref.get("source")
+            candidate["page"] = ref.get("page")
+            return
 
 
 class RagPipeline:
@@ -62,6 +49,10 @@ class RagPipeline:
                 uploads_dir: Optional[Path] = None,  # add this
                 chunk_size: Optional[int] = None,    # add this
                 chunk_overlap: Optional[int] = None, # add this
+                dedup: Optional[bool] = None,
+                overviews_dir: Optional[Path] = None,
+                llm: Optional[LlmRouter] = None,
+                artifacts_dir: Optional[Path] = None,
     ):
     
         self.chroma_persist_dir = chroma_persist_dir or CHROMA_DIR
@@ -71,25 +62,67 @@ class RagPipeline:
         self.ollama_model = ollama_model or OLLAMA_MODEL
         self.chunk_size = chunk_size or CHUNK_SIZE
         self.chunk_overlap = chunk_overlap or CHUNK_OVERLAP
+        self.dedup = DEDUP_ENABLED if dedup is None else dedup
+        if self.dedup:
+            validate_min_jaccard(DEDUP_MIN_JACCARD)
+        self.overviews_dir = overviews_dir or OVERVIEWS_DIR
+        self.artifacts_dir = artifacts_dir or ARTIFACTS_DIR
+
+        # Load-balanced chat across the configured Ollama hosts
+        self.llm = llm or LlmRouter()
+
+        # Create / open collection (Chroma handles embedding function internally).
+        # After an embedding model change the old collection cannot be opened; the
+        # pipeline still starts so reindex_all() can rebuild it.
+        try:
+            self.collection = get_collection(str(self.chroma_persist_dir), self.collection_name, self.embed_model)
+        except EmbeddingModelMismatch as e:
+            logger.warning("%s. %s", e, REINDEX_HINT)
+            self.collection = None
+
+    def _require_collection(self):
+        if self.collection is None:
+            raise RuntimeError(
+                f"Collection {self.collection_name!r} was built with a different embedding model. {REINDEX_HINT}"
+            )
+        return self.collection
+
+    def _load_pages(self, pdf_path: Path) -> Tuple[List[Dict], Optional[str], bool]:
+        """
+        Returns (pages, file_hash, from_cache). Parsed pages are cached by file
+        content hash, so re-ingesting or summarizing skips pymupdf.
+        """
+        fhash = file_hash(pdf_path) if ARTIFACT_CACHE_ENABLED else None
+        pages = load_pages(self.artifacts_dir, fhash) if fhash else None
+        if pages is not None:
+            return pages, fhash, True
 
-        # Create / open collection (Chroma handles embedding function internally)
-        self.collection = get_collection(str(self.chroma_persist_dir), self.collection_name, self.embed_model)
+        pages, _ = load_pdf_and_texts(pdf_path)  # May raise FileNotFoundError / ValueError
+        if fhash:
+            save_pages(self.artifacts_dir, fhash, pages)
+        return pages, fhash, False
 
 
     # -----------------------
     # Ingestion
     # -----------------------
-    def ingest_file_id(self, file_id: str, force: bool = False) -> Dict:
-      
+    def ingest_file_id(self, file_id: str, force: bool = False, progress: Optional[Callable[[str], None]] = None, collection=None) -> Dict:
+
+        # progress(stage) is called as ingestion moves through parsing -> chunking -> indexing -> entities
+        report = progress or (lambda stage: None)
+
         pdf_path = self.uploads_dir / f"{file_id}.pdf"
 
         # Error handling for not exisiting PDFs
         if not pdf_path.exists():
             raise FileNotFoundError(f"PDF not found for file_id={file_id}: {pdf_path}")
 
-        pages, _ = load_pdf_and_texts(pdf_path)  # May raise FileNotFoundError / ValueError
+        # Parsed pages and chunk offsets are cached by file content hash, so
+        # re-ingesting (e.g. after an embedding model change) skips both stages
+        report("parsing")
+        pages, fhash, pages_cached = self._load_pages(pdf_path)
         source_name = file_id
-        
+
 
         # Build 'all_text' list expected by validate_chunks (keys: text, source, page)
         all_texts = []
@@ -101,10 +134,19 @@ class RagPipeline:
             })
 
         # Chunking
-        split_texts, chunk_metadatas = validate_chunks(
-            all_texts, 
-            chunk_size=self.chunk_size, 
-            chunk_overlap=self.chunk_overlap)
+        report("chunking")
+        cached_chunks = None
+        if pages_cached:
+            cached_chunks = load_chunks(self.artifacts_dir, fhash, self.chunk_size, self.chunk_overlap, pages, source_name)
+        if cached_chunks is not None:
+            split_texts, chunk_metadatas = cached_chunks
+        else:
+            split_texts, chunk_metadatas = validate_chunks(
+                all_texts, 
+                chunk_size=self.chunk_size, 
+                chunk_overlap=self.chunk_overlap)
+            if fhash:
+                save_chunks(self.artifacts_dir, fhash, self.chunk_size, self.chunk_overlap, pages, split_texts)
 
         # If no chunks extracted, return info denoting that
         if not split_texts:
@@ -115,26 +157,116 @@ class RagPipeline:
         metadatas = chunk_metadatas  # already contains source, page, chunk_length, etc.
 
         # Upsert to chroma (delete old source chunks inside upsert_document)
-        upsert_document(self.collection, source_name, documents, metadatas)
+        report("indexing")
+        collection = collection if collection is not None else self._require_collection()
+        # With dedup on, text identical to a chunk already in the corpus is referenced, not re-embedded
+        dedup_stats = {"added": len(documents), "deduplicated": 0}
+        if self.dedup:
+            dedup_stats = upsert_document_dedup(collection, source_name, documents, metadatas)
+        else:
+            upsert_document(collection, source_name, documents, metadatas)
 
         # Document-level entities (optional) — store/return for downstream use
+        report("entities")
         entities = extract_entities(all_texts)
 
         return {
             "file_id": file_id,
             "source": source_name,
             "chunks": len(documents),
+            "deduplicated": dedup_stats["deduplicated"],
             "status": "ingested",
             "entities": entities,
         }
 
+    def reindex_all(self) -> Dict:
+        """
+        Re-ingest every uploaded PDF (e.g. after changing the embedding model).
+
+        Builds a fresh staging collection with the current embedding model and
+        swaps it in only if every file succeeded; the live collection keeps
+        serving queries meanwhile. Cached pages and chunks make this run at
+        embedding speed.
+        """
+        persist_path = str(self.chroma_persist_dir)
+        # "." cannot appear in tenant ids, so this never names a tenant's collection
+        staging_name = f"{self.collection_name}.reindex"
+        staging = create_fresh_collection(persist_path, staging_name, self.embed_model)
+
+        results = {}
+        for pdf_path in sorted(self.uploads_dir.glob("*.pdf")):
+            file_id = pdf_path.stem
+            try:
+                results[file_id] = self.ingest_file_id(file_id, force=True, collection=staging).get("status")
+            except Exception as e:
+                logger.warning("Reindex of %s failed: %s", file_id, e)
+                results[file_id] = f"failed: {e}"
+
+        if any(str(status).startswith("failed") for status in results.values()):
+            drop_collection(persist_path, staging_name)
+            return {"swapped": False, "files": results}
+
+        self.collection = swap_collection(persist_path, staging, self.collection_name)
+        return {"swapped": True, "files": results}
+
+    # -----------------------
+    # Overviews (optional background step after ingestion)
+    # -----------------------
+    def mark_overview_building(self, file_id: str):
+        save_overview(self.overviews_dir, file_id, building_overview(file_id))
+
+    def build_overview(self, file_id: str, progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """
+        Overview generation is background work: its LLM calls run at background
+        priority in the router, and `progress(done, total)` is called between sections.
+        """
+        pdf_path = self.uploads_dir / f"{file_id}.pdf"
+        chat_fn = functools.partial(self.llm.chat, priority=BACKGROUND)
+
+        try:
+            pages, _, _ = self._load_pages(pdf_path)
+            overview = build_overview(chat_fn, self.ollama_model, file_id, pages, OVERVIEW_SECTION_CHARS, progress=progress)
+        except Exception as e:
+            overview = {"source": file_id, "status": "failed", "error": str(e)}
+
+        save_overview(self.overviews_dir, file_id, overview)
+        return overview
+
+    def get_overview(self, file_id: str) -> Optional[Dict]:
+        return load_overview(self.overviews_dir, file_id, stale_after=OVERVIEW_BUILD_TIMEOUT)
+
     # -----------------------
     # Querying / Answering
     # -----------------------
-    def answer(self, user_query: str, source_name: Optional[str] = None, top_k: int = 5) -> Dict:
-      
-        # Retrieve from Chroma
-        raw = retrieve(self.collection, user_query, source_name, top_k)
+    def answer(self,
+               user_query: str,
+               source_name: Optional[str] = None,
+               top_k: int = 5,
+               adaptive: bool = False,
+               min_k: Optional[int] = None,
+    ) -> Dict:
+        """
+        With adaptive=True, top_k is the ceiling: up to top_k chunks are fetched
+        and only the head before a score gap / relative drop is kept (never fewer than min_k).
+        """
+
+        # Overview questions about one document are served from its precomputed overview
+        if source_name:
+            routed = answer_from_overview(user_query, self.get_overview(source_name))
+            if routed is not None:
+                return {
+                    "answer": routed["answer"],
+                    "sources": [],
+                    "retrieved": 0,
+                    "k": 0,
+                    "cutoff_reason": None,
+                    "route": "overview",
+                    "obligations": routed["obligations"],
+                }
+
+        # Retrieve from Chroma (over-fetch when dedup is on, so collapsed copies don't leave slots empty)
+        n_fetch = top_k * DEDUP_OVERFETCH_FACTOR if self.dedup else top_k
+        raw = retrieve(self._require_collection(), user_query, source_name, n_fetch)
 
         # Chroma returns nested lists for each input query; we used single query -> index 0
         docs = raw.get("documents", [[]])[0]
@@ -146,13 +278,41 @@ class RagPipeline:
         candidates = []
         for i in range(len(docs)):
             meta = metadatas[i] if i < len(metadatas) else {}
-            candidates.append({
+            candidate = {
                 "id": ids[i] if i < len(ids) else None,
                 "source": meta.get("source", None),
                 "page": meta.get("page", None),
                 "text": docs[i],
                 "score": (1.0 - distances[i]) if distances and i < len(distances) and distances[i] is not None else None,
-            })
+            }
+            # Deduplicated chunks carry back-references to every source/page sharing them
+            if meta.get("refs"):
+                try:
+                    candidate["refs"] = json.loads(meta["refs"])
+                except ValueError:
+                    pass
+            candidates.append(candidate)
+
+        # Collapse near-identical results; only identical copies contribute refs
+        if self.dedup:
+            candidates = collapse_near_duplicates(candidates, min_jaccard=DEDUP_MIN_JACCARD)[:top_k]
+
+        # A shared chunk (identical text) is labelled with its first source; cite the queried document instead
+        if source_name:
+            for c in candidates:
+                _label_with_source(c, source_name)
+
+        # Adaptive mode: keep only the strong head of the over-fetched list
+        cutoff_reason = None
+        if adaptive:
+            k, cutoff_reason = select_adaptive_k(
+                [c.get("score") for c in candidates],
+                min_k=min_k or ADAPTIVE_MIN_K,
+                max_k=top_k,
+                score_gap=ADAPTIVE_SCORE_GAP,
+                max_drop=ADAPTIVE_MAX_DROP,
+            )
+            candidates = candidates[:k]
 
         context_parts = []
         for c in candidates:
@@ -168,8 +328,9 @@ class RagPipeline:
         # Build prompt
         prompt = generate_prompt(context, user_query)
 
-        # Call Ollama
-        answer_text = _ollama_chat(self.ollama_model, prompt, temperature=0.0, num_predict=512)
+        # Call Ollama (short factual questions may go to the fast model)
+        model = self.llm.select_model(user_query, self.ollama_model)
+        answer_text = self.llm.chat(model, prompt, temperature=0.0, num_predict=512, fallback_model=self.ollama_model)
 
         # Return structured response
         sources_out = []
@@ -180,10 +341,14 @@ class RagPipeline:
                 "page": c.get("page"),
                 "text": (c.get("text")[:600] + "...") if c.get("text") and len(c.get("text")) > 600 else c.get("text"),
                 "score": c.get("score"),
+                "refs": c.get("refs"),
             })
 
         return {
             "answer": answer_text,
             "sources": sources_out,
-            "retrieved": len(sources_out)
+            "retrieved": len(sources_out),
+            "k": len(sources_out),
+            "cutoff_reason": cutoff_reason,
+            "route": "retrieval",
         }
@@ -8,4 +8,32 @@ def generate_prompt(context, user_query):
     User Question: {user_query}
 
     Answer:"""
-    return prompt
\ No newline at end of file
+    return prompt
+
+def generate_section_summary_prompt(section_text, pages):
+
+    prompt = f"""You are a legal document analyzer. Read the following section of a legal document (pages {pages}).
+
+    1. Summarize the section in 2-4 sentences.
+    2. List every obligation it imposes, one per line, in the form:
+       OBLIGATION: <party> | <what the party must or must not do>
+
+    Section Text:
+    {section_text}
+
+    Start the summary with "SUMMARY:".
+
+    Answer:"""
+    return prompt
+
+
+def generate_document_summary_prompt(section_summaries):
+
+    prompt = f"""You are a legal document analyzer. Below are summaries of consecutive sections of one legal document.
+    Write a concise overview of the whole document: its type, the parties, the key terms, dates and amounts, and anything unusual.
+
+    Section Summaries:
+    {section_summaries}
+
+    Overview:"""
+    return prompt
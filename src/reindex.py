@@ -0,0 +1,35 @@
+"""
+Rebuild collections with the current EMBED_MODEL, e.g. after changing it.
+
+    python -m src.reindex               # every tenant
+    python -m src.reindex --tenant acme
+
+Run it while the API is stopped (or use POST /admin/reindex on a running server).
+"""
+
+import argparse
+import json
+import logging
+
+from src.api.tenants import TenantManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenant", help="only reindex this tenant")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    manager = TenantManager()
+    if args.tenant:
+        results = {args.tenant: manager.get(args.tenant).rag.reindex_all()}
+    else:
+        results = manager.reindex_all()
+    print(json.dumps(results, indent=2))
+
+    failed = [tid for tid, r in results.items() if not r.get("swapped")]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,3 +1,3 @@
-from .chroma_store import get_collection, upsert_document, retrieve
+from .chroma_store import get_collection, upsert_document, upsert_document_dedup, retrieve, EmbeddingModelMismatch
 
-__all__ = ["get_collection", "upsert_document", "retrieve"]
\ No newline at end of file
+__all__ = ["get_collection", "upsert_document", "upsert_document_dedup", "retrieve", "EmbeddingModelMismatch"]
\ No newline at end of file
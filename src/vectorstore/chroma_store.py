@@ -1,27 +1,195 @@
 from typing import List, Dict, Optional
+from functools import lru_cache
+import json
 import chromadb
 from chromadb.utils import embedding_functions
 
-def get_collection(persist_path: str, collection_name: str, embed_model: str):
-    client = chromadb.PersistentClient(path=persist_path)
-    embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
+from src.ingest.dedup import text_hash
+
+# Number of chunk text hashes looked up per query for existing copies
+DEDUP_LOOKUP_BATCH = 50
+
+# -- Client and embedding model are shared by every collection (e.g. one per tenant)
+@lru_cache()
+def _get_client(persist_path: str):
+    return chromadb.PersistentClient(path=persist_path)
+
+@lru_cache()
+def _get_embedding_fn(embed_model: str):
+    return embedding_functions.SentenceTransformerEmbeddingFunction(
         model_name=embed_model
     )
-    return client.get_or_create_collection(
+
+class EmbeddingModelMismatch(Exception):
+    """The collection was built with a different embedding model; it must be reindexed."""
+
+
+def get_collection(persist_path: str, collection_name: str, embed_model: str):
+    client = _get_client(persist_path)
+    embedding_fn = _get_embedding_fn(embed_model)
+    try:
+        collection = client.get_or_create_collection(
+            collection_name,
+            embedding_function=embedding_fn
+        )
+    except ValueError as e:
+        # Chroma persists the embedding function config and refuses a different one
+        if "embedding function" in str(e).lower():
+            raise EmbeddingModelMismatch(f"Collection {collection_name!r} was built with another embedding model: {e}") from e
+        raise
+
+    # Chroma only compares function names, so a different model of the same kind
+    # (e.g. another sentence-transformers model) has to be caught here
+    persisted = ((collection.configuration_json or {}).get("embedding_function") or {}).get("config")
+    if persisted is not None and _embedding_config_differs(persisted, embedding_fn.get_config()):
+        raise EmbeddingModelMismatch(
+            f"Collection {collection_name!r} was built with embedding config {persisted}, not {embedding_fn.get_config()}"
+        )
+    return collection
+
+def _embedding_config_differs(persisted: Dict, current: Dict) -> bool:
+    # Device and similar runtime settings may legitimately differ between machines
+    if "model_name" in persisted and "model_name" in current:
+        return persisted["model_name"] != current["model_name"]
+    return persisted != current
+
+def create_fresh_collection(persist_path: str, collection_name: str, embed_model: str):
+    drop_collection(persist_path, collection_name)
+    return _get_client(persist_path).create_collection(
         collection_name,
-        embedding_function=embedding_fn
+        embedding_function=_get_embedding_fn(embed_model)
     )
 
-def upsert_document(collection, source_name: str, documents: List[str], metadatas: List[Dict]):
+def drop_collection(persist_path: str, collection_name: str):
+    try:
+        _get_client(persist_path).delete_collection(collection_name)
+    except Exception:
+        pass  # does not exist
+
+def swap_collection(persist_path: str, staging, target_name: str):
+    # Replace target with the fully built staging collection; the gap between
+    # delete and rename is a single metadata operation
+    drop_collection(persist_path, target_name)
+    staging.modify(name=target_name)
+    return staging
+
+# -- Shared (deduplicated) chunks carry one boolean membership key per source
+# -- plus a JSON "refs" list of {"source", "page"} back-references
+def _member_key(source_name: str) -> str:
+    return f"src::{source_name}"
+
+def _source_where(source_name: str) -> Dict:
+    return {"$or": [{"source": source_name}, {_member_key(source_name): True}]}
+
+def _load_refs(meta: Dict) -> List[Dict]:
+    try:
+        return json.loads(meta.get("refs") or "[]")
+    except (TypeError, ValueError):
+        return []
+
+def detach_source(collection, source_name: str):
+    # Drop this source's back-references from chunks shared with other sources
+    try:
+        shared = collection.get(where={_member_key(source_name): True}, include=["metadatas"])
+    except Exception:
+        shared = {"ids": [], "metadatas": []}
+
+    for chunk_id, meta in zip(shared.get("ids") or [], shared.get("metadatas") or []):
+        refs = [r for r in _load_refs(meta) if r.get("source") != source_name]
+        if not refs:
+            continue  # only referenced by this source; removed by the delete below
+
+        meta = dict(meta)
+        meta[_member_key(source_name)] = False
+        meta["refs"] = json.dumps(refs)
+        meta["ref_count"] = len(refs)
+        if meta.get("source") == source_name:
+            meta["source"] = refs[0].get("source")
+            meta["page"] = refs[0].get("page")
+        collection.update(ids=[chunk_id], metadatas=[meta])
+
     # Delete old chunks for this source
     try:
-            collection.delete(where={"source": source_name})
+        collection.delete(where=_source_where(source_name))
     except Exception:
         pass  # nothing to delete or backend behavior difference
 
+def upsert_document(collection, source_name: str, documents: List[str], metadatas: List[Dict]):
+    detach_source(collection, source_name)
+
     ids = [f"{source_name}_chunk_{i}" for i in range(len(documents))]
     collection.add(documents=documents, metadatas=metadatas, ids=ids)
 
+def upsert_document_dedup(collection, source_name: str, documents: List[str], metadatas: List[Dict]) -> Dict:
+    """
+    Like upsert_document, but chunks whose normalized text is identical to an
+    already stored chunk (in this document or anywhere in the corpus) are not
+    embedded again; the stored chunk gains a back-reference to this source and
+    page instead. Near-duplicates are stored as they are, so every chunk's text
+    is exactly what its sources contain.
+    """
+    detach_source(collection, source_name)
+
+    hashes = [text_hash(d) for d in documents]
+
+    existing: Dict[str, Dict] = {}  # text_hash -> metadata of the stored chunk
+    existing_ids: Dict[str, str] = {}
+    unique_hashes = sorted(set(hashes))
+    for start in range(0, len(unique_hashes), DEDUP_LOOKUP_BATCH):
+        batch = unique_hashes[start:start + DEDUP_LOOKUP_BATCH]
+        try:
+            found = collection.get(where={"text_hash": {"$in": batch}}, include=["metadatas"])
+        except Exception:
+            found = {"ids": [], "metadatas": []}
+        for chunk_id, meta in zip(found.get("ids") or [], found.get("metadatas") or []):
+            h = meta.get("text_hash")
+            if h and h not in existing:
+                existing[h] = dict(meta)
+                existing_ids[h] = chunk_id
+
+    updated: Dict[str, Dict] = {}
+    new_by_hash: Dict[str, Dict] = {}
+
+    new_ids: List[str] = []
+    new_docs: List[str] = []
+    new_metas: List[Dict] = []
+
+    for doc, meta, h in zip(documents, metadatas, hashes):
+        ref = {"source": source_name, "page": meta.get("page")}
+
+        target = existing.get(h)
+        if target is not None:
+            updated[existing_ids[h]] = target
+        else:
+            target = new_by_hash.get(h)
+
+        if target is not None:
+            refs = _load_refs(target)
+            if ref not in refs:
+                refs.append(ref)
+            target["refs"] = json.dumps(refs)
+            target["ref_count"] = len(refs)
+            target[_member_key(source_name)] = True
+            continue
+
+        meta = dict(meta)
+        meta["text_hash"] = h
+        meta["refs"] = json.dumps([ref])
+        meta["ref_count"] = 1
+        meta[_member_key(source_name)] = True
+
+        new_ids.append(f"chunk_{h[:20]}")
+        new_docs.append(doc)
+        new_metas.append(meta)
+        new_by_hash[h] = meta
+
+    if updated:
+        collection.update(ids=list(updated.keys()), metadatas=list(updated.values()))
+    if new_docs:
+        collection.add(documents=new_docs, metadatas=new_metas, ids=new_ids)
+
+    return {"added": len(new_docs), "deduplicated": len(documents) - len(new_docs)}
+
 def retrieve(collection, query: str, source_name: Optional[str], top_k: int):
     query_kwargs = {
         "query_texts": [query],
@@ -30,6 +198,6 @@ def retrieve(collection, query: str, source_name: Optional[str], top_k: int):
 
     # Only filter if a specific source is provided
     if source_name:
-        query_kwargs["where"] = {"source": source_name}
+        query_kwargs["where"] = _source_where(source_name)
 
     return collection.query(**query_kwargs)
@@ -0,0 +1,41 @@
+import pymupdf
+import pytest
+from chromadb.api.types import EmbeddingFunction
+
+import src.vectorstore.chroma_store as chroma_store
+
+
+class ToyEmbedding(EmbeddingFunction):
+    """Deterministic character-histogram embedding; `dim` stands in for the model."""
+
+    def __init__(self, dim: int = 8):
+        self.dim = dim
+
+    def __call__(self, input):
+        return [[float(sum(1 for ch in doc.lower() if ord(ch) % self.dim == i)) + 1.0 for i in range(self.dim)] for doc in input]
+
+    @staticmethod
+    def name():
+        return "toy"
+
+    def get_config(self):
+        return {"dim": self.dim}
+
+    @staticmethod
+    def build_from_config(config):
+        return ToyEmbedding(config["dim"])
+
+
+@pytest.fixture
+def toy_embeddings(monkeypatch):
+    # embed_model "toy-<dim>" selects a ToyEmbedding of that dimension
+    monkeypatch.setattr(chroma_store, "_get_embedding_fn", lambda embed_model: ToyEmbedding(int(embed_model.split("-")[1])))
+
+
+def write_pdf(path, pages):
+    doc = pymupdf.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_textbox(pymupdf.Rect(40, 40, 560, 800), text, fontsize=9)
+    doc.save(str(path))
+    doc.close()
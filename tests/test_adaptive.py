@@ -0,0 +1,41 @@
+from src.rag.adaptive import select_adaptive_k
+
+
+def _select(scores, min_k=2, max_k=10, score_gap=0.15, max_drop=0.35):
+    return select_adaptive_k(scores, min_k=min_k, max_k=max_k, score_gap=score_gap, max_drop=max_drop)
+
+
+def test_cuts_at_score_gap():
+    assert _select([0.8, 0.78, 0.5, 0.49]) == (2, "score_gap")
+
+
+def test_cuts_at_relative_drop_from_best():
+    assert _select([0.8, 0.7, 0.6, 0.5, 0.4]) == (4, "relative_threshold")
+
+
+def test_gap_inside_min_k_is_ignored():
+    assert _select([0.9, 0.2, 0.19], min_k=2) == (2, "relative_threshold")
+
+
+def test_max_k_reached():
+    assert _select([0.8] * 8, max_k=5) == (5, "max_k")
+
+
+def test_fewer_results_than_max_k():
+    assert _select([0.8] * 3, max_k=5) == (3, "exhausted")
+
+
+def test_missing_scores_keep_everything():
+    assert _select([0.9, None, 0.1]) == (3, "no_scores")
+
+
+def test_empty_results():
+    assert _select([]) == (0, "exhausted")
+
+
+def test_min_k_larger_than_results():
+    assert _select([0.9], min_k=5) == (1, "exhausted")
+
+
+def test_negative_scores_from_l2_distance():
+    assert _select([-0.1, -0.15, -0.6], min_k=1) == (2, "score_gap")
@@ -0,0 +1,40 @@
+import pytest
+from fastapi import HTTPException
+
+import src.api.main as main
+
+
+def test_finished_ingest_jobs_are_bounded(monkeypatch):
+    monkeypatch.setattr(main, "_ingest_jobs", {})
+    monkeypatch.setattr(main, "INGEST_JOBS_MAX", 2)
+
+    main._set_ingest_job("t", "running", status="running")
+    for i in range(4):
+        main._set_ingest_job("t", f"done{i}", status="ingested", result={"entities": ["x"] * 100})
+
+    # Oldest finished jobs go first; running jobs are never dropped
+    assert set(main._ingest_jobs) == {("t", "running"), ("t", "done2"), ("t", "done3")}
+
+
+def test_finished_ingest_jobs_expire(monkeypatch):
+    monkeypatch.setattr(main, "_ingest_jobs", {})
+    monkeypatch.setattr(main, "INGEST_JOB_TTL_SECONDS", 60)
+
+    main._set_ingest_job("t", "old", status="failed", error="boom")
+    main._set_ingest_job("t", "queued", status="queued")
+    for job in main._ingest_jobs.values():
+        job["updated_at"] -= 120
+
+    main._set_ingest_job("t", "new", status="ingested")
+    assert set(main._ingest_jobs) == {("t", "queued"), ("t", "new")}
+
+
+@pytest.mark.parametrize("file_id", ["acme/2f1c4a52-8a55-4c8e-9d36-1d2b8c0f3e11", "../x", "", "not-a-uuid"])
+def test_file_ids_must_be_uuids(file_id):
+    with pytest.raises(HTTPException) as e:
+        main._check_file_id(file_id)
+    assert e.value.status_code == 400
+
+
+def test_valid_file_id_is_normalized():
+    assert main._check_file_id("2F1C4A52-8A55-4C8E-9D36-1D2B8C0F3E11") == "2f1c4a52-8a55-4c8e-9d36-1d2b8c0f3e11"
@@ -0,0 +1,104 @@
+import random
+import threading
+
+from src.ingest.artifacts import file_hash, load_pages, save_pages, load_chunks, save_chunks
+from src.ingest.chunking import validate_chunks
+
+WORDS = "the buyer shall pay seller within thirty days of notice under this agreement".split()
+
+
+def _pages(seed=1, n=4):
+    rng = random.Random(seed)
+    return [
+        {
+            "page": i,
+            "text": "\n\n".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 120))) + "." for _ in range(12)),
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def test_pages_round_trip(tmp_path):
+    pages = _pages()
+    save_pages(tmp_path, "h", [dict(p, source="x.pdf") for p in pages])
+    assert load_pages(tmp_path, "h") == pages
+    assert load_pages(tmp_path, "missing") is None
+
+
+def test_chunks_round_trip_matches_validate_chunks(tmp_path):
+    pages = _pages()
+    split_texts, metadatas = validate_chunks([dict(p, source="f") for p in pages], chunk_size=1000, chunk_overlap=200)
+    assert split_texts
+
+    save_chunks(tmp_path, "h", 1000, 200, pages, split_texts)
+    assert load_chunks(tmp_path, "h", 1000, 200, pages, "f") == (split_texts, metadatas)
+
+
+def test_chunks_keyed_by_chunking_params(tmp_path):
+    pages = _pages()
+    split_texts, _ = validate_chunks([dict(p, source="f") for p in pages], chunk_size=1000, chunk_overlap=200)
+    save_chunks(tmp_path, "h", 1000, 200, pages, split_texts)
+    assert load_chunks(tmp_path, "h", 500, 100, pages, "f") is None
+
+
+def test_repeated_text_on_a_page_maps_to_the_right_offsets(tmp_path):
+    para = "The buyer shall pay the seller within thirty days of receiving a valid invoice under this agreement."
+    pages = [{"page": 1, "text": "\n\n".join([para] * 30)}]
+    split_texts, metadatas = validate_chunks([dict(p, source="f") for p in pages], chunk_size=300, chunk_overlap=100)
+
+    save_chunks(tmp_path, "h", 300, 100, pages, split_texts)
+    assert load_chunks(tmp_path, "h", 300, 100, pages, "f") == (split_texts, metadatas)
+
+
+def test_unmappable_chunks_are_not_cached(tmp_path):
+    pages = [{"page": 1, "text": "some page text"}]
+    save_chunks(tmp_path, "h", 1000, 200, pages, [{"text": "not on the page", "page": 1, "chunk_index": 0}])
+    assert load_chunks(tmp_path, "h", 1000, 200, pages, "f") is None
+
+
+def test_corrupt_artifact_is_ignored(tmp_path):
+    (tmp_path / "pages").mkdir()
+    (tmp_path / "pages" / "h.json.gz").write_bytes(b"not gzip")
+    assert load_pages(tmp_path, "h") is None
+
+
+def test_truncated_artifact_is_ignored(tmp_path):
+    save_pages(tmp_path, "h", _pages())
+    path = tmp_path / "pages" / "h.json.gz"
+    path.write_bytes(path.read_bytes()[:40])  # valid gzip header, truncated stream
+    assert load_pages(tmp_path, "h") is None
+
+
+def test_concurrent_writes_of_the_same_file(tmp_path):
+    pages = _pages()
+    errors = []
+
+    def write():
+        try:
+            for _ in range(20):
+                save_pages(tmp_path, "h", pages)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert load_pages(tmp_path, "h") == pages
+    assert [p.name for p in (tmp_path / "pages").iterdir()] == ["h.json.gz"]
+
+
+def test_failed_write_is_not_fatal(tmp_path):
+    (tmp_path / "pages").write_text("a file where the directory should be")
+    save_pages(tmp_path, "h", _pages())
+    assert load_pages(tmp_path, "h") is None
+
+
+def test_file_hash_depends_on_content(tmp_path):
+    a, b = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    a.write_bytes(b"one")
+    b.write_bytes(b"two")
+    assert file_hash(a) != file_hash(b)
+    assert len(file_hash(a)) == 64
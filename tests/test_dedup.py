@@ -0,0 +1,137 @@
+import random
+
+import chromadb
+import pytest
+from chromadb.api.types import EmbeddingFunction
+
+from src.ingest.dedup import (
+    shingles,
+    jaccard,
+    normalize_text,
+    text_hash,
+    validate_min_jaccard,
+    collapse_near_duplicates,
+)
+from src.rag.pipeline import _label_with_source
+from src.vectorstore.chroma_store import upsert_document_dedup, retrieve
+
+GOVERNING_LAW = (
+    "This Agreement shall be governed by and construed in accordance with the laws of the "
+    "State of New York, without regard to its conflict of laws principles. Any dispute arising "
+    "hereunder shall be resolved exclusively in the state and federal courts located in New York County."
+)
+KINGS_COUNTY = GOVERNING_LAW.replace("New York County", "Kings County")
+
+WORDS = (
+    "party agreement shall notice term payment buyer seller goods delivery warranty breach "
+    "remedy court law indemnify claim liability damages termination effective date price "
+    "invoice confidential information assign consent written amendment waiver"
+).split()
+
+
+def _random_text(rng, n=150):
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def test_normalization_ignores_only_whitespace_and_case():
+    assert text_hash(GOVERNING_LAW) == text_hash("  " + GOVERNING_LAW.upper().replace(" ", "\n  "))
+    assert text_hash(GOVERNING_LAW) != text_hash(KINGS_COUNTY)
+    assert normalize_text("$1,000.00") != normalize_text("$1000.00")
+
+
+def test_clause_differing_by_county_is_a_near_duplicate():
+    assert jaccard(shingles(GOVERNING_LAW), shingles(KINGS_COUNTY)) >= 0.8
+
+
+def test_unrelated_text_is_not_a_duplicate():
+    rng = random.Random(1)
+    a, b = shingles(_random_text(rng)), shingles(_random_text(rng))
+    assert jaccard(a, b) < 0.8
+
+
+def test_validate_min_jaccard():
+    assert validate_min_jaccard(0.8) == 0.8
+    with pytest.raises(ValueError):
+        validate_min_jaccard(0)
+    with pytest.raises(ValueError):
+        validate_min_jaccard(1.5)
+
+
+def test_collapse_keeps_best_and_merges_refs():
+    candidates = [
+        {"text": GOVERNING_LAW, "source": "a", "page": 1},
+        {"text": GOVERNING_LAW + " ", "source": "b", "page": 7},
+        {"text": "Completely different payment terms for the buyer.", "source": "c", "page": 2},
+    ]
+    kept = collapse_near_duplicates(candidates, min_jaccard=0.8)
+    assert [c["source"] for c in kept] == ["a", "c"]
+    assert kept[0]["refs"] == [{"source": "a", "page": 1}, {"source": "b", "page": 7}]
+
+
+def test_collapse_drops_near_duplicate_without_borrowing_its_citation():
+    candidates = [
+        {"text": GOVERNING_LAW, "source": "a", "page": 1},
+        {"text": KINGS_COUNTY, "source": "b", "page": 3},
+    ]
+    kept = collapse_near_duplicates(candidates, min_jaccard=0.8)
+    assert len(kept) == 1
+    assert kept[0]["refs"] == [{"source": "a", "page": 1}]
+
+    # Scoped to b, a's wording is never cited as b's page
+    _label_with_source(kept[0], "b")
+    assert (kept[0]["source"], kept[0]["page"]) == ("a", 1)
+
+
+def test_label_with_source_uses_queried_document():
+    c = {"source": "a", "page": 1, "refs": [{"source": "a", "page": 1}, {"source": "b", "page": 7}]}
+    _label_with_source(c, "b")
+    assert (c["source"], c["page"]) == ("b", 7)
+
+
+class _BagOfWordsEmbedding(EmbeddingFunction):
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [[float(doc.lower().count(w)) for w in WORDS] + [1.0] for doc in input]
+
+    @staticmethod
+    def name():
+        return "test-bag-of-words"
+
+    def get_config(self):
+        return {}
+
+
+@pytest.fixture
+def collection(request):
+    client = chromadb.EphemeralClient()
+    name = f"dedup_{abs(hash(request.node.name))}"
+    yield client.create_collection(name, embedding_function=_BagOfWordsEmbedding())
+    client.delete_collection(name)
+
+
+def test_upsert_dedup_shares_only_identical_text(collection):
+    other = "The buyer shall pay the invoice price within thirty days of delivery of the goods."
+    stats_a = upsert_document_dedup(collection, "a", [GOVERNING_LAW, other], [{"source": "a", "page": 9}, {"source": "a", "page": 1}])
+    stats_b = upsert_document_dedup(collection, "b", [GOVERNING_LAW.replace(" ", "  ")], [{"source": "b", "page": 3}])
+    stats_c = upsert_document_dedup(collection, "c", [KINGS_COUNTY], [{"source": "c", "page": 2}])
+
+    assert stats_a == {"added": 2, "deduplicated": 0}
+    assert stats_b == {"added": 0, "deduplicated": 1}
+    assert stats_c == {"added": 1, "deduplicated": 0}
+    assert collection.count() == 3
+
+    raw = retrieve(collection, "governing law courts", "b", 5)
+    assert len(raw["ids"][0]) == 1
+    assert raw["metadatas"][0][0]["source"] == "a"  # shared copy; the pipeline relabels it via refs
+
+    # The near-duplicate keeps its own wording
+    raw = retrieve(collection, "governing law courts", "c", 5)
+    assert raw["documents"][0] == [KINGS_COUNTY]
+
+    # Re-ingesting "a" without the clause hands the shared chunk over to "b"
+    upsert_document_dedup(collection, "a", [other], [{"source": "a", "page": 1}])
+    raw = retrieve(collection, "governing law courts", "b", 5)
+    assert raw["metadatas"][0][0]["source"] == "b"
+    assert raw["metadatas"][0][0]["page"] == 3
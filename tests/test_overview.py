@@ -0,0 +1,117 @@
+import time
+
+import pytest
+
+from src.rag.overview import (
+    split_sections,
+    build_overview,
+    _parse_section_output,
+    answer_from_overview,
+    building_overview,
+    save_overview,
+    load_overview,
+)
+
+OVERVIEW = {
+    "source": "f",
+    "status": "ready",
+    "summary": "A supply agreement between Acme (seller) and Beta (buyer).",
+    "sections": [],
+    "obligations": [
+        {"party": "Buyer", "obligation": "pay within 30 days", "pages": [1, 2]},
+        {"party": "The Seller", "obligation": "deliver the goods", "pages": [3, 3]},
+    ],
+}
+
+
+def test_parse_section_output():
+    output = (
+        "SUMMARY: The buyer pays.\n"
+        "It covers payment.\n"
+        "- OBLIGATION: Buyer | pay the price\n"
+        "OBLIGATION: Seller | deliver goods\n"
+        "OBLIGATION: malformed line without separator\n"
+    )
+    parsed = _parse_section_output(output, [1, 2])
+    assert parsed["summary"] == "The buyer pays. It covers payment."
+    assert parsed["obligations"] == [
+        {"party": "Buyer", "obligation": "pay the price", "pages": [1, 2]},
+        {"party": "Seller", "obligation": "deliver goods", "pages": [1, 2]},
+    ]
+
+
+def test_split_sections_groups_pages():
+    pages = [{"page": i, "text": "x" * 2500} for i in range(1, 6)]
+    assert [s["pages"] for s in split_sections(pages, 6000)] == [[1, 2], [3, 4], [5, 5]]
+
+
+def test_split_sections_keeps_all_text_of_oversized_pages():
+    text = "".join(chr(ord("a") + i % 26) for i in range(15000))
+    sections = split_sections([{"page": 1, "text": text}, {"page": 2, "text": "tail"}], 6000)
+    assert all(len(s["text"]) <= 6000 for s in sections)
+    assert "".join(s["text"] for s in sections).replace("\n\n", "") == text + "tail"
+    assert sections[-1]["pages"] == [1, 2]
+
+
+def test_build_overview_map_reduce():
+    calls = []
+
+    def chat(model, prompt, temperature=0.1, num_predict=512):
+        calls.append(prompt)
+        if "Section Text" in prompt:
+            return "SUMMARY: A section.\nOBLIGATION: Buyer | pay"
+        return "Whole document."
+
+    pages = [{"page": i, "text": "x" * 4000} for i in range(1, 4)]
+    progress = []
+    overview = build_overview(chat, "m", "f", pages, 6000, progress=lambda done, total: progress.append((done, total)))
+    assert overview["status"] == "ready"
+    assert overview["summary"] == "Whole document."
+    assert len(overview["obligations"]) == 3
+    assert len(calls) == 4  # 3 sections + 1 reduce
+    assert progress == [(0, 3), (1, 3), (2, 3), (3, 3)]  # before every LLM call
+
+
+@pytest.mark.parametrize("question", [
+    "Summarize this agreement",
+    "please summarise the contract.",
+    "Give me a brief summary of this document?",
+    "What is this agreement about?",
+])
+def test_summary_requests_are_routed(question):
+    assert answer_from_overview(question, OVERVIEW)["answer"] == OVERVIEW["summary"]
+
+
+@pytest.mark.parametrize("question", [
+    "Is there a summary judgment waiver?",
+    "Does the seller have an obligation to indemnify the buyer for third-party IP claims?",
+    "List all obligations of the buyer to indemnify",
+    "List all obligations of the landlord",
+    "What is the price?",
+])
+def test_specific_questions_go_to_retrieval(question):
+    assert answer_from_overview(question, OVERVIEW) is None
+
+
+def test_obligations_filtered_by_party():
+    routed = answer_from_overview("List all obligations of the seller", OVERVIEW)
+    assert [o["party"] for o in routed["obligations"]] == ["The Seller"]
+    assert "deliver the goods (pages 3-3)" in routed["answer"]
+
+
+def test_all_obligations():
+    routed = answer_from_overview("What are the obligations under this agreement?", OVERVIEW)
+    assert len(routed["obligations"]) == 2
+
+
+def test_not_ready_overview_is_not_used():
+    assert answer_from_overview("Summarize this agreement", dict(OVERVIEW, status="building")) is None
+
+
+def test_stale_building_overview_is_reported_failed(tmp_path):
+    save_overview(tmp_path, "f", building_overview("f"))
+    assert load_overview(tmp_path, "f", stale_after=60)["status"] == "building"
+
+    save_overview(tmp_path, "f", dict(building_overview("f"), started_at=time.time() - 120))
+    assert load_overview(tmp_path, "f", stale_after=60)["status"] == "failed"
+    assert load_overview(tmp_path, "g") is None
@@ -0,0 +1,88 @@
+import src.rag.pipeline as pipeline_module
+from src.api.tenants import TENANT_ID_RE
+from src.config import COLLECTION_NAME
+from src.llm.router import LlmRouter
+from src.rag.pipeline import RagPipeline
+
+from conftest import write_pdf
+
+CLAUSE = (
+    "The Buyer shall pay the Seller the purchase price within thirty days after delivery of the goods. "
+    "Late payments accrue interest at one percent per month until paid in full. "
+)
+
+
+def _pipeline(tmp_path, embed_model, collection_name=None, uploads="uploads"):
+    return RagPipeline(
+        chroma_persist_dir=tmp_path / "chroma",
+        collection_name=collection_name,
+        uploads_dir=tmp_path / uploads,
+        overviews_dir=tmp_path / "overviews",
+        artifacts_dir=tmp_path / "artifacts",
+        embed_model=embed_model,
+        llm=LlmRouter(hosts=["http://127.0.0.1:1"]),
+    )
+
+
+def test_reindex_after_embedding_model_change(tmp_path, toy_embeddings, monkeypatch):
+    (tmp_path / "uploads").mkdir()
+    write_pdf(tmp_path / "uploads" / "doc1.pdf", [CLAUSE * 4, "Notices must be in writing. " * 20])
+    write_pdf(tmp_path / "uploads" / "doc2.pdf", ["The Seller warrants the goods for one year. " * 12])
+
+    old = _pipeline(tmp_path, "toy-8")
+    assert old.ingest_file_id("doc1")["status"] == "ingested"
+    assert old.ingest_file_id("doc2")["status"] == "ingested"
+
+    # The old collection cannot be opened with the new model, but the pipeline still starts
+    new = _pipeline(tmp_path, "toy-16")
+    assert new.collection is None
+
+    # Reindexing must not parse PDFs again: everything comes from the artifact cache
+    def no_parse(path):
+        raise AssertionError(f"re-parsed {path}")
+
+    monkeypatch.setattr(pipeline_module, "load_pdf_and_texts", no_parse)
+    result = new.reindex_all()
+
+    assert result == {"swapped": True, "files": {"doc1": "ingested", "doc2": "ingested"}}
+    assert new.collection.count() > 0
+    raw = pipeline_module.retrieve(new.collection, "purchase price", "doc1", 3)
+    assert raw["ids"][0]
+
+    # Reopening with the new model now works
+    assert _pipeline(tmp_path, "toy-16").collection is not None
+
+
+def test_failed_reindex_keeps_live_collection(tmp_path, toy_embeddings):
+    (tmp_path / "uploads").mkdir()
+    write_pdf(tmp_path / "uploads" / "doc1.pdf", [CLAUSE * 4])
+    rag = _pipeline(tmp_path, "toy-8")
+    rag.ingest_file_id("doc1")
+    live = rag.collection.count()
+
+    (tmp_path / "uploads" / "broken.pdf").write_bytes(b"not a pdf")
+    result = rag.reindex_all()
+
+    assert result["swapped"] is False
+    assert result["files"]["broken"].startswith("failed")
+    assert rag.collection.count() == live
+
+
+def test_reindex_staging_collection_is_outside_tenant_namespace(tmp_path, toy_embeddings):
+    # Tenant collections are f"{COLLECTION_NAME}__{tenant_id}"; "reindex" is a valid tenant id
+    assert TENANT_ID_RE.match("reindex")
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "tenant").mkdir()
+    write_pdf(tmp_path / "uploads" / "doc1.pdf", [CLAUSE * 4])
+    write_pdf(tmp_path / "tenant" / "doc2.pdf", ["The Seller warrants the goods for one year. " * 12])
+
+    tenant = _pipeline(tmp_path, "toy-8", collection_name=f"{COLLECTION_NAME}__reindex", uploads="tenant")
+    tenant.ingest_file_id("doc2")
+    before = tenant.collection.count()
+
+    default = _pipeline(tmp_path, "toy-8")
+    default.ingest_file_id("doc1")
+    assert default.reindex_all()["swapped"] is True
+
+    reopened = _pipeline(tmp_path, "toy-8", collection_name=f"{COLLECTION_NAME}__reindex", uploads="tenant")
+    assert reopened.collection.count() == before
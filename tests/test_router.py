@@ -0,0 +1,201 @@
+import threading
+import time
+
+import ollama
+import pytest
+
+import src.llm.router as router
+from src.llm.ollama_client import get_client, is_unreachable_error
+from src.llm.router import LlmRouter, BACKGROUND, is_short_factual
+
+
+@pytest.fixture
+def fake_hosts(monkeypatch):
+    """
+    Host behaviour by URL: "down" refuses connections, "nomodel" answers 404,
+    "slow" takes 0.5s, anything else answers immediately.
+    """
+    calls = []
+
+    def fake_chat(model, prompt, temperature=0.1, num_predict=512, host=None):
+        calls.append(host)
+        if host == "down":
+            raise ConnectionError("connection refused")
+        if host == "nomodel":
+            raise ollama.ResponseError("model not found", 404)
+        if host == "slow":
+            time.sleep(0.5)
+        return f"{model}@{host}"
+
+    monkeypatch.setattr(router, "chat", fake_chat)
+    monkeypatch.setattr(router, "check_ollama", lambda host: host != "down")
+    return calls
+
+
+def test_unreachable_host_is_marked_down_and_skipped(fake_hosts):
+    llm = LlmRouter(hosts=["down", "up"], max_retries=2, hedge_after=0)
+    assert llm.chat("m", "p") == "m@up"
+    assert {s["host"]: s["healthy"] for s in llm.status()} == {"down": False, "up": True}
+
+    fake_hosts.clear()
+    assert llm.chat("m", "p") == "m@up"
+    assert fake_hosts == ["up"]
+
+
+def test_model_error_retries_elsewhere_without_marking_host_down(fake_hosts):
+    llm = LlmRouter(hosts=["nomodel", "up"], max_retries=1, hedge_after=0)
+    assert llm.chat("m", "p") == "m@up"
+    assert all(s["healthy"] for s in llm.status())
+
+
+def test_all_hosts_failing_raises(fake_hosts):
+    llm = LlmRouter(hosts=["down"], max_retries=2, hedge_after=0)
+    with pytest.raises(RuntimeError):
+        llm.chat("m", "p")
+    assert fake_hosts == ["down"] * 3
+
+
+def test_down_host_is_reprobed_after_health_interval(fake_hosts, monkeypatch):
+    llm = LlmRouter(hosts=["a", "b"], hedge_after=0, health_interval=0)
+    llm.hosts[0].healthy = False
+    llm.chat("m", "p")  # starts the probe in the background
+    for _ in range(100):
+        if llm.hosts[0].healthy:
+            break
+        time.sleep(0.01)
+    assert llm.hosts[0].healthy
+    assert llm.chat("m", "p") == "m@a"  # least loaded again
+
+
+def test_down_host_is_probed_once_per_interval(monkeypatch):
+    probes = []
+    release = threading.Event()
+
+    def slow_check(host):
+        probes.append(host)
+        release.wait(1)
+        return False
+
+    monkeypatch.setattr(router, "check_ollama", slow_check)
+    monkeypatch.setattr(router, "chat", lambda model, prompt, temperature=0.1, num_predict=512, host=None: "ok")
+    llm = LlmRouter(hosts=["down", "up"], hedge_after=0, health_interval=0)
+    llm.hosts[0].healthy = False
+
+    # Concurrent requests neither wait for the probe nor start more than one
+    start = time.monotonic()
+    threads = [threading.Thread(target=llm.chat, args=("m", "p")) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert time.monotonic() - start < 0.5
+    assert probes == ["down"]
+    release.set()
+
+
+def test_fast_model_falls_back_to_default_when_not_pulled(monkeypatch):
+    calls = []
+
+    def fake_chat(model, prompt, temperature=0.1, num_predict=512, host=None):
+        calls.append(model)
+        if model == "small":
+            raise ollama.ResponseError("model 'small' not found", 404)
+        return f"{model}@{host}"
+
+    monkeypatch.setattr(router, "chat", fake_chat)
+    llm = LlmRouter(hosts=["a", "b"], max_retries=1, hedge_after=0, fast_model="small")
+    model = llm.select_model("Who is the buyer?", "big")
+    assert model == "small"
+    assert llm.chat(model, "p", fallback_model="big").startswith("big@")
+
+    # The fast path is skipped until the next health interval
+    assert llm.select_model("Who is the buyer?", "big") == "big"
+
+
+def test_connection_errors_do_not_fall_back(fake_hosts):
+    llm = LlmRouter(hosts=["down"], max_retries=0, hedge_after=0)
+    with pytest.raises(RuntimeError):
+        llm.chat("small", "p", fallback_model="big")
+    assert fake_hosts == ["down"]
+
+
+def test_hedged_request_returns_first_answer(fake_hosts):
+    llm = LlmRouter(hosts=["slow", "fast"], hedge_after=0.05)
+    start = time.monotonic()
+    assert llm.chat("m", "p") == "m@fast"
+    assert time.monotonic() - start < 0.4
+
+
+def test_picks_least_queued_host(fake_hosts):
+    llm = LlmRouter(hosts=["a", "b"], hedge_after=0)
+    llm.hosts[0].queued = 3
+    assert llm.chat("m", "p") == "m@b"
+
+
+def test_per_host_concurrency_limit(monkeypatch):
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def fake_chat(model, prompt, temperature=0.1, num_predict=512, host=None):
+        with lock:
+            running.append(host)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(host)
+        return "ok"
+
+    monkeypatch.setattr(router, "chat", fake_chat)
+    llm = LlmRouter(hosts=["a"], max_concurrency=2, hedge_after=0)
+    threads = [threading.Thread(target=llm.chat, args=("m", "p")) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(peak) == 2
+
+
+def test_background_requests_leave_a_slot_for_interactive(monkeypatch):
+    release = threading.Event()
+    started = []
+
+    def fake_chat(model, prompt, temperature=0.1, num_predict=512, host=None):
+        started.append(prompt)
+        if prompt.startswith("bg"):
+            release.wait(2)
+        return prompt
+
+    monkeypatch.setattr(router, "chat", fake_chat)
+    llm = LlmRouter(hosts=["a"], max_concurrency=2, reserved_interactive=1, hedge_after=0)
+    background = [threading.Thread(target=llm.chat, args=("m", f"bg{i}"), kwargs={"priority": BACKGROUND}) for i in range(2)]
+    for t in background:
+        t.start()
+    time.sleep(0.05)
+    assert started == ["bg0"] or started == ["bg1"]  # second background call waits
+
+    # The reserved slot is free for an interactive query
+    assert llm.chat("m", "interactive") == "interactive"
+
+    release.set()
+    for t in background:
+        t.join()
+    assert len(started) == 3
+
+
+def test_fast_path_model_selection():
+    llm = LlmRouter(hosts=["a"], fast_model="small")
+    assert llm.select_model("Who is the buyer?", "big") == "small"
+    assert llm.select_model("Explain how the indemnification and limitation of liability clauses interact", "big") == "big"
+    assert LlmRouter(hosts=["a"], fast_model="").select_model("Who is the buyer?", "big") == "big"
+    assert is_short_factual("When does the lease end?")
+    assert not is_short_factual("Summarize this agreement")
+
+
+def test_error_classification_and_client_timeout():
+    import httpx
+
+    assert is_unreachable_error(ConnectionError())
+    assert is_unreachable_error(httpx.ReadTimeout("slow"))
+    assert not is_unreachable_error(ollama.ResponseError("model not found", 404))
+    assert get_client("http://127.0.0.1:1")._client.timeout.read is not None
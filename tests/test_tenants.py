@@ -0,0 +1,185 @@
+import threading
+import time
+
+import pytest
+
+import src.api.tenants as tenants_module
+from src.api.tenants import (
+    TENANT_ID_RE,
+    QueryPriorityGate,
+    RateLimitExceeded,
+    TenantManager,
+    TokenBucket,
+    UnknownTenant,
+)
+
+
+class FakePipeline:
+    def __init__(self, uploads_dir):
+        self.uploads_dir = uploads_dir
+
+    def reindex_all(self):
+        if self.uploads_dir.name == "broken":
+            raise RuntimeError("boom")
+        return {"swapped": True, "files": {}}
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(tenants_module, "UPLOADS_DIR", tmp_path / "uploads")
+    monkeypatch.setattr(tenants_module, "TENANTS", [])
+    monkeypatch.setattr(tenants_module, "TENANT_QUERY_RATE", 5)
+    monkeypatch.setattr(tenants_module, "TENANT_MAX_CONCURRENT_INGEST", 1)
+    monkeypatch.setattr(TenantManager, "_open_pipeline", lambda self, tid: FakePipeline(tmp_path / "uploads" / tid))
+    return TenantManager(max_open=2)
+
+
+def test_token_bucket_burst_then_refill():
+    bucket = TokenBucket(rate=20, burst=2)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert not bucket.is_full()
+    time.sleep(0.06)
+    assert bucket.try_acquire()
+    time.sleep(0.15)
+    assert bucket.is_full()
+
+
+def test_zero_rate_is_unlimited():
+    bucket = TokenBucket(rate=0, burst=1)
+    assert all(bucket.try_acquire() for _ in range(100))
+    assert bucket.is_full()
+
+
+def test_limits_are_off_by_default(manager, monkeypatch):
+    monkeypatch.setattr(tenants_module, "TENANT_QUERY_RATE", 0)
+    monkeypatch.setattr(tenants_module, "TENANT_MAX_CONCURRENT_INGEST", 0)
+    tenant = manager.get()
+    for _ in range(50):
+        with manager.query(tenant):
+            pass
+    for _ in range(3):
+        manager.begin_ingest(tenant)
+    for _ in range(3):
+        manager.end_ingest(tenant)
+    assert tenant.limits.idle()
+
+
+def test_yield_to_queries_waits_for_inflight_queries():
+    gate = QueryPriorityGate()
+    done = threading.Event()
+
+    def background():
+        gate.yield_to_queries(max_wait=2)
+        done.set()
+
+    with gate.interactive():
+        t = threading.Thread(target=background)
+        t.start()
+        assert not done.wait(0.05)
+    assert done.wait(1)
+    t.join()
+
+    # Bounded wait: a query that never finishes does not block background work forever
+    with gate.interactive():
+        start = time.monotonic()
+        gate.yield_to_queries(max_wait=0.05)
+        assert time.monotonic() - start < 0.5
+
+
+@pytest.mark.parametrize("tenant_id", ["a", "acme", "acme-legal_2", "A1"])
+def test_valid_tenant_ids(tenant_id):
+    assert TENANT_ID_RE.match(tenant_id)
+
+
+@pytest.mark.parametrize("tenant_id", ["", "acme-", "_acme", "acme_", "ac me", "a" * 49, "../x"])
+def test_invalid_tenant_ids(tenant_id):
+    assert not TENANT_ID_RE.match(tenant_id)
+
+
+def test_invalid_id_is_rejected(manager):
+    with pytest.raises(ValueError):
+        manager.get("acme-")
+
+
+def test_tenant_is_created_only_on_upload(manager, tmp_path):
+    with pytest.raises(UnknownTenant):
+        manager.get("acme")
+    assert not (tmp_path / "uploads" / "acme").exists()
+    assert manager.open_tenants() == []
+
+    created = manager.get("acme", create=True)
+    assert (tmp_path / "uploads" / "acme").is_dir()
+    assert manager.get("acme") is created
+
+
+def test_default_tenant_always_exists(manager):
+    assert manager.get().tenant_id == tenants_module.DEFAULT_TENANT
+
+
+def test_allowlist(manager, monkeypatch):
+    monkeypatch.setattr(tenants_module, "TENANTS", ["acme"])
+    manager.get("acme", create=True)
+    with pytest.raises(UnknownTenant):
+        manager.get("other", create=True)
+
+
+def test_lru_eviction_keeps_busy_limits_and_forgets_idle_ones(manager):
+    a = manager.get("a", create=True)
+    b = manager.get("b", create=True)
+    manager.begin_ingest(a)
+    b.limits.query_bucket.try_acquire()
+
+    manager.get("c", create=True)  # evicts a
+    manager.get("d", create=True)  # evicts b
+    assert manager.open_tenants() == ["c", "d"]
+
+    # a is still ingesting, so its cap survives eviction
+    assert manager.get("a").limits is a.limits
+    with pytest.raises(RateLimitExceeded):
+        manager.begin_ingest(manager.get("a"))
+    manager.end_ingest(a)
+
+    # Once idle, evicted tenants' limits are dropped so the map stays bounded
+    time.sleep(0.25)
+    manager.get("e", create=True)
+    manager.get("f", create=True)
+    assert set(manager._limits) <= set(manager.open_tenants()) | {"a"}
+
+
+def test_ingest_cap(manager):
+    tenant = manager.get("acme", create=True)
+    manager.begin_ingest(tenant)
+    with pytest.raises(RateLimitExceeded):
+        manager.begin_ingest(tenant)
+    manager.end_ingest(tenant)
+    manager.begin_ingest(tenant)
+    manager.end_ingest(tenant)
+
+
+def test_reindex_covers_every_created_tenant(manager, tmp_path):
+    (tmp_path / "uploads").mkdir()
+    for tid in ("acme", "broken"):
+        manager.get(tid, create=True)
+    (tmp_path / "uploads" / "not a tenant").mkdir()
+
+    assert manager.known_tenants() == [tenants_module.DEFAULT_TENANT, "acme", "broken"]
+    results = manager.reindex_all()
+    assert results[tenants_module.DEFAULT_TENANT]["swapped"] is True
+    assert results["acme"]["swapped"] is True
+    assert results["broken"] == {"swapped": False, "error": "boom"}
+
+
+def test_default_tenant_overviews_leave_the_shared_root(tmp_path, monkeypatch):
+    root = tmp_path / "overviews"
+    (root / "acme").mkdir(parents=True)
+    (root / "acme" / "u1.json").write_text("{}")
+    (root / "old.json").write_text("{}")
+    monkeypatch.setattr(tenants_module, "OVERVIEWS_DIR", root)
+
+    target = root / tenants_module.DEFAULT_TENANT
+    tenants_module._migrate_root_overviews(target)
+    assert (target / "old.json").exists()
+    assert not (root / "old.json").exists()
+    assert (root / "acme" / "u1.json").exists()  # other tenants are untouched
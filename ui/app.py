@@ -1,11 +1,81 @@
 # ui/app.py
 import os
+import time
+import uuid
 import requests
+from requests.adapters import HTTPAdapter
 import streamlit as st
 from pathlib import Path
 
 # Config: point to your running FastAPI server
 API_URL = os.getenv("RAG_API_URL", "http://127.0.0.1:8000")
+TENANT_ID = os.getenv("RAG_TENANT_ID", "")  # sent as X-Tenant-ID; empty uses the server's default tenant
+QUERY_CACHE_TTL = int(os.getenv("RAG_UI_QUERY_CACHE_TTL", "600"))
+INGEST_POLL_SECONDS = float(os.getenv("RAG_UI_INGEST_POLL_SECONDS", "1.0"))
+INGEST_MAX_WAIT = int(os.getenv("RAG_UI_INGEST_MAX_WAIT", "1800"))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+# One pooled HTTP session shared across reruns and browser sessions
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if TENANT_ID:
+        session.headers["X-Tenant-ID"] = TENANT_ID
+    return session
+
+
+def _multipart_stream(field: str, filename: str, fileobj, content_type: str, boundary: str):
+    # Yields a multipart/form-data body piece by piece so the file is sent chunked, not buffered
+    filename = filename.replace('"', "")
+    yield (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode("utf-8")
+    fileobj.seek(0)
+    while True:
+        block = fileobj.read(UPLOAD_CHUNK_BYTES)
+        if not block:
+            break
+        yield block
+    yield f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+
+def upload_pdf(uploaded) -> dict:
+    boundary = uuid.uuid4().hex
+    resp = get_http_session().post(
+        f"{API_URL}/upload",
+        data=_multipart_stream("file", uploaded.name, uploaded, "application/pdf", boundary),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        timeout=60,
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+# Identical (file_id, question, top_k) queries are answered from cache across reruns and users.
+# ingest_version and overview_status are only part of the cache key: a re-ingest or an
+# overview becoming ready changes them, so stale answers are not served.
+@st.cache_data(ttl=QUERY_CACHE_TTL, show_spinner=False)
+def run_query(file_id: str, question: str, top_k: int, ingest_version: float, overview_status: str) -> dict:
+    params = {"question": question, "file_id": file_id, "top_k": top_k}
+    r = get_http_session().post(f"{API_URL}/query", params=params, timeout=120)
+    r.raise_for_status()
+    return r.json()
+
+
+def get_overview_status(file_id: str) -> str:
+    try:
+        r = get_http_session().get(f"{API_URL}/overview/{file_id}", timeout=5)
+    except requests.RequestException:
+        return "unknown"
+    if r.status_code != 200:
+        return "none"
+    return r.json().get("status", "unknown")
 
 st.set_page_config(page_title="Legal Document RAG", page_icon="⚖️", layout="wide")
 
@@ -26,6 +96,8 @@ if "ingest_status" not in st.session_state:
     st.session_state.ingest_status = None
 if "last_answer" not in st.session_state:
     st.session_state.last_answer = None
+if "ingest_version" not in st.session_state:
+    st.session_state.ingest_version = 0.0
 
 # Upload box
 st.header("1) Upload PDF")
@@ -38,10 +110,7 @@ with col1:
         st.write(uploaded.name)
         if st.button("Upload"):
             try:
-                files = {"file": (uploaded.name, uploaded.getvalue(), "application/pdf")}
-                resp = requests.post(f"{API_URL}/upload", files=files, timeout=60)
-                resp.raise_for_status()
-                data = resp.json()
+                data = upload_pdf(uploaded)
                 st.session_state.file_id = data["file_id"]
                 st.session_state.uploaded_filename = data["filename"]
                 st.success(f"Uploaded {uploaded.name} → file_id: {st.session_state.file_id}")
@@ -60,11 +129,34 @@ if st.session_state.file_id:
     st.write("File ID:", st.session_state.file_id)
     if st.button("Ingest Document"):
         try:
+            session = get_http_session()
+            file_id = st.session_state.file_id
             with st.spinner("Ingesting (chunking, embedding, indexing) — this can take a few seconds..."):
-                r = requests.post(f"{API_URL}/ingest/{st.session_state.file_id}", timeout=120)
+                r = session.post(f"{API_URL}/ingest/{file_id}", params={"background": "true"}, timeout=30)
                 r.raise_for_status()
-                data = r.json()
+
+                # Poll progress instead of holding one long request open
+                stage_text = st.empty()
+                deadline = time.monotonic() + INGEST_MAX_WAIT
+                while True:
+                    r = session.get(f"{API_URL}/ingest/{file_id}/status", timeout=10)
+                    r.raise_for_status()
+                    job = r.json()
+                    if job.get("status") not in ("queued", "running"):
+                        break
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"ingest still {job.get('status')} after {INGEST_MAX_WAIT}s")
+                    stage_text.write(f"Stage: {job.get('stage') or job.get('status')}")
+                    time.sleep(INGEST_POLL_SECONDS)
+                stage_text.empty()
+
+                if job.get("status") == "failed":
+                    raise RuntimeError(job.get("error") or "unknown error")
+                data = job.get("result") or {}
                 st.session_state.ingest_status = data.get("status", "ingested")
+                # Answers cached before this ingest are no longer valid
+                st.session_state.ingest_version = time.time()
+                run_query.clear()
                 st.success(f"Ingest finished: {st.session_state.ingest_status} — chunks: {data.get('chunks')}")
                 # store entities optionally
                 if data.get("entities"):
@@ -90,17 +182,23 @@ if ask_button:
     else:
         try:
             with st.spinner("Running retrieval and LLM..."):
-                params = {"question": query, "file_id": st.session_state.file_id, "top_k": top_k}
-                r = requests.post(f"{API_URL}/query", params=params, timeout=120)
-                r.raise_for_status()
-                result = r.json()
+                file_id = st.session_state.file_id
+                result = run_query(
+                    file_id,
+                    query.strip(),
+                    int(top_k),
+                    st.session_state.ingest_version,
+                    get_overview_status(file_id),
+                )
                 st.session_state.last_answer = result
-        except Exception as e:
+        except requests.HTTPError as e:
             st.error(f"Query failed: {e}")
             try:
-                st.json(r.json())
+                st.json(e.response.json())
             except Exception:
                 pass
+        except Exception as e:
+            st.error(f"Query failed: {e}")
 
 # Display results
 if st.session_state.last_answer: